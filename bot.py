@@ -8,9 +8,12 @@ from bot.config import TOKEN_TELEGRAM, OPENAI_API_KEY
 from bot.crew_manager import CrewManager
 from bot.handlers.start import router
 from bot.scheduler import ReminderSystem
+from bot.twilio_gateway import TwilioGateway
+from webapp.database import close_pool
 
 reminder_system = None
 crew_manager = None
+twilio_gateway = None
 
 
 class AppMiddleware:
@@ -25,12 +28,14 @@ class AppMiddleware:
 
 
 async def on_startup(bot: Bot, dispatcher: Dispatcher):
-    global reminder_system, crew_manager
+    global reminder_system, crew_manager, twilio_gateway
 
     crew_manager = CrewManager(api_key=OPENAI_API_KEY)
     logging.info("Zainicjalizowano CrewManager z obsługą Crew AI")
 
-    reminder_system = ReminderSystem(bot=bot, crew_manager=crew_manager)
+    twilio_gateway = TwilioGateway()
+
+    reminder_system = ReminderSystem(bot=bot, crew_manager=crew_manager, twilio_gateway=twilio_gateway)
     logging.info("Zainicjalizowano ReminderSystem z integracją Crew AI")
 
     middleware = AppMiddleware(reminder_system, crew_manager)
@@ -42,7 +47,14 @@ async def on_startup(bot: Bot, dispatcher: Dispatcher):
 
 async def on_shutdown(bot: Bot):
     logging.info("Bot stopping...")
+    if reminder_system:
+        await reminder_system.leader.stop()
+        await reminder_system.outbox.stop()
+        await reminder_system.state_writer.close()
+    if twilio_gateway:
+        await twilio_gateway.close()
     await bot.session.close()
+    close_pool()
 
 
 async def main():
@@ -1,4 +1,5 @@
 import os
+import socket
 
 from dotenv import load_dotenv
 
@@ -14,6 +15,16 @@ PGPORT = 49482
 
 DB_URL = f"postgresql://{PGUSER}:{PGPASSWORD}@{PGHOST}:{PGPORT}/{PGDATABASE}"
 
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', '30'))
+DB_STREAM_FETCH_SIZE = int(os.getenv('DB_STREAM_FETCH_SIZE', '500'))
+
+PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', '10000'))
+PROFILE_CACHE_TTL = float(os.getenv('PROFILE_CACHE_TTL', '300'))
+
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
@@ -23,4 +34,42 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
 COMPANY_NAME = os.getenv('COMPANY_NAME', 'System Monitorowania Dokumentów')
 MAX_CALL_ATTEMPTS = int(os.getenv('MAX_CALL_ATTEMPTS', '3'))
-CALL_RETRY_DAYS = int(os.getenv('CALL_RETRY_DAYS', '3'))
\ No newline at end of file
+CALL_RETRY_DAYS = int(os.getenv('CALL_RETRY_DAYS', '3'))
+
+TELEGRAM_REMINDER_DAYS = int(os.getenv('TELEGRAM_REMINDER_DAYS', '30'))
+SMS_REMINDER_DAYS = int(os.getenv('SMS_REMINDER_DAYS', '21'))
+CALL_REMINDER_DAYS = int(os.getenv('CALL_REMINDER_DAYS', '14'))
+
+REMINDER_SCAN_LIMIT = int(os.getenv('REMINDER_SCAN_LIMIT', '5000'))
+REMINDER_CONCURRENCY = int(os.getenv('REMINDER_CONCURRENCY', '20'))
+TELEGRAM_CONCURRENCY = int(os.getenv('TELEGRAM_CONCURRENCY', '10'))
+SMS_CONCURRENCY = int(os.getenv('SMS_CONCURRENCY', '5'))
+CALL_CONCURRENCY = int(os.getenv('CALL_CONCURRENCY', '3'))
+TELEGRAM_RATE_LIMIT = float(os.getenv('TELEGRAM_RATE_LIMIT', '25'))
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv('TELEGRAM_CHAT_RATE_LIMIT', '1'))
+SMS_RATE_LIMIT = float(os.getenv('SMS_RATE_LIMIT', '1'))
+SMS_NUMBER_RATE_LIMIT = float(os.getenv('SMS_NUMBER_RATE_LIMIT', '0.2'))
+CALL_RATE_LIMIT = float(os.getenv('CALL_RATE_LIMIT', '1'))
+CALL_NUMBER_RATE_LIMIT = float(os.getenv('CALL_NUMBER_RATE_LIMIT', '0.0167'))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '3'))
+REMINDER_MISFIRE_GRACE_TIME = int(os.getenv('REMINDER_MISFIRE_GRACE_TIME', '86400'))
+DUE_INDEX_HORIZON_DAYS = int(os.getenv('DUE_INDEX_HORIZON_DAYS', '1'))
+REMINDER_CLAIM_BATCH_SIZE = int(os.getenv('REMINDER_CLAIM_BATCH_SIZE', '200'))
+REMINDER_LEASE_SECONDS = int(os.getenv('REMINDER_LEASE_SECONDS', '900'))
+REMINDER_WORKER_ID = os.getenv('REMINDER_WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+LEADER_LOCK_KEY = int(os.getenv('LEADER_LOCK_KEY', '7420001'))
+LEADER_HEARTBEAT_INTERVAL = int(os.getenv('LEADER_HEARTBEAT_INTERVAL', '10'))
+REMINDER_INDEX_CHANNEL = os.getenv('REMINDER_INDEX_CHANNEL', 'reminder_index')
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '5'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_BACKOFF_BASE = float(os.getenv('OUTBOX_BACKOFF_BASE', '30'))
+OUTBOX_BACKOFF_MAX = float(os.getenv('OUTBOX_BACKOFF_MAX', '3600'))
+INCREMENTAL_SCAN_INTERVAL = int(os.getenv('INCREMENTAL_SCAN_INTERVAL', '3600'))
+SCAN_WATERMARK_OVERLAP = int(os.getenv('SCAN_WATERMARK_OVERLAP', '60'))
+CATCHUP_RATE = float(os.getenv('CATCHUP_RATE', '0.5'))
+DELIVERY_WINDOW_START = os.getenv('DELIVERY_WINDOW_START', '09:00')
+DELIVERY_WINDOW_END = os.getenv('DELIVERY_WINDOW_END', '20:00')
+DELIVERY_TIMEZONE = os.getenv('DELIVERY_TIMEZONE', 'Europe/Warsaw')
+REMINDER_DIGEST = os.getenv('REMINDER_DIGEST', 'false').lower() in ('1', 'true', 'yes')
+REMINDER_FLUSH_BATCH_SIZE = int(os.getenv('REMINDER_FLUSH_BATCH_SIZE', '100'))
+REMINDER_FLUSH_INTERVAL = float(os.getenv('REMINDER_FLUSH_INTERVAL', '0.5'))
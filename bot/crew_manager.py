@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from datetime import datetime
@@ -10,6 +11,7 @@ from langchain_openai import ChatOpenAI
 from bot.config import OPENAI_API_KEY
 from bot.data import document_types
 from webapp.models import UserProfile, Document
+from webapp.repository import UserProfileRepository, DocumentRepository
 
 logger = logging.getLogger(__name__)
 
@@ -364,32 +366,38 @@ class CrewManager:
             logger.error(f"Błąd podczas analizy dokumentu: {e}")
             return f"Wystąpił błąd podczas analizy: {str(e)}"
 
+    def _communication_expert(self):
+        return Agent(
+            role="Specjalista ds. Komunikacji",
+            goal="Tworzyć skuteczne, personalizowane wiadomości przypominające",
+            backstory="""
+            Jesteś ekspertem od komunikacji z wieloletnim doświadczeniem w tworzeniu skutecznych
+            wiadomości przypominających. Potrafisz dostosować ton, styl i treść wiadomości
+            do różnych kanałów komunikacji oraz pilności sprawy. Twoje wiadomości są jasne,
+            zwięzłe i motywujące do działania.
+            """,
+            verbose=True,
+            llm=self.llm
+        )
+
     async def generate_custom_reminder(self, user_id, document_id, reminder_type):
         try:
-            document = Document.get_by_id(document_id)
-            user = UserProfile.get_by_id(user_id)
+            document = await DocumentRepository.get_by_id(document_id)
+            user = await UserProfileRepository.get_by_id(user_id)
 
             if not document or not user:
                 return None
 
-            doc_content = self._extract_document_content(document)
+            # The document-type lookup and the crew run are blocking LLM calls;
+            # they run in a worker thread so concurrent deliveries and Telegram
+            # polling are not stalled on the event loop.
+            doc_content = await asyncio.to_thread(self._extract_document_content, document)
 
             current_date = datetime.now(pytz.UTC)
             days_left = (document.expiration_date - current_date).days if document.expiration_date else 30
 
             try:
-                communication_expert = Agent(
-                    role="Specjalista ds. Komunikacji",
-                    goal="Tworzyć skuteczne, personalizowane wiadomości przypominające",
-                    backstory="""
-                    Jesteś ekspertem od komunikacji z wieloletnim doświadczeniem w tworzeniu skutecznych
-                    wiadomości przypominających. Potrafisz dostosować ton, styl i treść wiadomości
-                    do różnych kanałów komunikacji oraz pilności sprawy. Twoje wiadomości są jasne,
-                    zwięzłe i motywujące do działania.
-                    """,
-                    verbose=True,
-                    llm=self.llm
-                )
+                communication_expert = self._communication_expert()
 
                 reminder_task = Task(
                     description=f"""
@@ -432,7 +440,9 @@ class CrewManager:
                     process=Process.sequential
                 )
 
-                message = reminder_crew.kickoff()
+                result = await asyncio.to_thread(reminder_crew.kickoff)
+                # kickoff() returns a CrewOutput; the generated text is in .raw.
+                message = getattr(result, 'raw', result)
 
                 if message and isinstance(message, str) and len(message) > 10:
                     logger.info(f"Wygenerowano spersonalizowaną wiadomość CrewAI dla dokumentu {document_id}")
@@ -499,28 +509,145 @@ class CrewManager:
             logger.error(f"Błąd podczas generowania przypomnienia: {e}")
             return None
 
+    async def generate_digest_reminder(self, user_id, document_ids, reminder_type):
+        # Jedno zapytanie do LLM dla wszystkich dokumentów użytkownika należnych
+        # tego samego dnia w tym samym kanale.
+        try:
+            user = await UserProfileRepository.get_by_id(user_id)
+            documents = [document for document in [await DocumentRepository.get_by_id(document_id)
+                                                   for document_id in document_ids] if document]
+
+            if not user or not documents:
+                return None
+
+            current_date = datetime.now(pytz.UTC)
+            entries = []
+            for document in documents:
+                doc_type = next((value['type'] for key, value in document_types.items()
+                                 if key in (document.title or '').lower()), "Dokument urzędowy")
+                days_left = (document.expiration_date - current_date).days if document.expiration_date else 30
+                entries.append((document, doc_type, days_left))
+
+            documents_list = "\n".join(
+                f"- {document.title} ({doc_type}), data wygaśnięcia: "
+                f"{document.expiration_date.strftime('%d.%m.%Y') if document.expiration_date else 'brak'}, "
+                f"pozostało dni: {days_left}"
+                for document, doc_type, days_left in entries
+            )
+
+            try:
+                communication_expert = self._communication_expert()
+
+                digest_task = Task(
+                    description=f"""
+                    Przygotuj jedną zbiorczą wiadomość przypominającą o kilku wygasających dokumentach.
+
+                    Informacje o użytkowniku:
+                    - Imię: {user.first_name}
+                    - Nazwisko: {user.last_name if user.last_name else ''}
+
+                    Dokumenty:
+                    {documents_list}
+
+                    Kanał komunikacji: {reminder_type.upper()}
+
+                    Wytyczne:
+                    - Jeśli kanał to 'telegram': Stwórz pełną wiadomość z formatowaniem Markdown i listą dokumentów
+                    - Jeśli kanał to 'sms': Stwórz krótką (max 320 znaków) wiadomość bez formatowania, wymień wszystkie dokumenty
+                    - Jeśli kanał to 'voice': Stwórz tekst do odczytania przez syntezator mowy, używaj naturalnego języka mówionego
+
+                    Wiadomość powinna:
+                    - Być w języku polskim
+                    - Wymienić każdy dokument i jego termin ważności, zaczynając od najpilniejszego
+                    - Sugerować następne kroki do podjęcia
+
+                    Zwróć TYLKO treść wiadomości, bez dodatkowych komentarzy czy metadanych.
+                    """,
+                    agent=communication_expert,
+                    expected_output="Zbiorcza wiadomość przypominająca w języku polskim"
+                )
+
+                digest_crew = Crew(
+                    agents=[communication_expert],
+                    tasks=[digest_task],
+                    verbose=1,
+                    process=Process.sequential
+                )
+
+                result = await asyncio.to_thread(digest_crew.kickoff)
+                # kickoff() returns a CrewOutput; the generated text is in .raw.
+                message = getattr(result, 'raw', result)
+
+                if message and isinstance(message, str) and len(message) > 10:
+                    logger.info(f"Wygenerowano zbiorczą wiadomość CrewAI dla użytkownika {user_id} "
+                                f"({len(documents)} dokumentów)")
+                    return message
+
+                logger.warning("Nie uzyskano poprawnej wiadomości z CrewAI, używam szablonu zastępczego")
+
+            except Exception as e:
+                logger.error(f"Błąd podczas generowania wiadomości zbiorczej z CrewAI: {e}")
+                logger.info("Przechodzę do generowania szablonowego")
+
+            entries.sort(key=lambda entry: entry[2])
+            if reminder_type == 'telegram':
+                items = "\n".join(
+                    f"• *{document.title}* ({doc_type}) – wygasa za {days_left} dni"
+                    for document, doc_type, days_left in entries
+                )
+                return (
+                    f"📢 *Przypomnienie o dokumentach* 📢\n\n"
+                    f"Witaj {user.first_name},\n\n"
+                    f"Wkrótce wygasają Twoje dokumenty:\n{items}\n\n"
+                    f"Zalecamy zaplanowanie ich odnowienia z wyprzedzeniem."
+                )
+            elif reminder_type == 'sms':
+                items = ", ".join(
+                    f"{document.title} ({document.expiration_date.strftime('%d.%m.%Y')})"
+                    for document, _, _ in entries if document.expiration_date
+                )
+                return f"Przypomnienie: wygasaja Twoje dokumenty: {items}. Zaplanuj odnowienie."
+            elif reminder_type == 'voice':
+                items = ", ".join(
+                    f"{document.title} za {days_left} dni" for document, _, days_left in entries
+                )
+                return (
+                    f"Dzień dobry, {user.first_name}. Dzwonimy przypomnieć, że wkrótce wygasają Twoje dokumenty: "
+                    f"{items}. Zalecamy zaplanowanie ich odnowienia. Dziękujemy za uwagę."
+                )
+
+            return "Przypomnienie: wygasają dokumenty: " + ", ".join(document.title for document, _, _ in entries)
+
+        except Exception as e:
+            logger.error(f"Błąd podczas generowania przypomnienia zbiorczego: {e}")
+            return None
+
     async def generate_document_report(self, user_id):
         try:
-            user = UserProfile.get_by_id(user_id)
+            user = await UserProfileRepository.get_by_id(user_id)
             if not user:
                 return "Nie znaleziono użytkownika"
 
-            documents = Document.get_by_user_id(user_id)
-            if not documents:
-                return "Nie znaleziono dokumentów dla tego użytkownika"
-
             docs_data = []
+            expiring = []
+            total_documents = 0
             current_date = datetime.now(pytz.UTC)
 
-            for doc in documents:
-                if doc.expiration_date:
-                    days_left = (doc.expiration_date - current_date).days
-                    docs_data.append({
-                        "name": doc.title,
-                        "type": self._extract_document_content(doc)["document_type"],
-                        "expiration_date": doc.expiration_date.strftime("%d.%m.%Y"),
-                        "days_left": days_left
-                    })
+            async for documents in DocumentRepository.stream_by_user_id(user_id, columns=Document.REPORT_COLUMNS):
+                total_documents += len(documents)
+                for doc in documents:
+                    if doc.expiration_date:
+                        days_left = (doc.expiration_date - current_date).days
+                        expiring.append((doc, days_left))
+                        docs_data.append({
+                            "name": doc.title,
+                            "type": self._extract_document_content(doc)["document_type"],
+                            "expiration_date": doc.expiration_date.strftime("%d.%m.%Y"),
+                            "days_left": days_left
+                        })
+
+            if not total_documents:
+                return "Nie znaleziono dokumentów dla tego użytkownika"
 
             try:
                 document_analyst = Agent(
@@ -574,20 +701,13 @@ class CrewManager:
             except Exception as e:
                 logger.error(f"Błąd podczas generowania raportu z CrewAI: {e}")
 
-            current_date = datetime.now(pytz.UTC)
-
             report = f"# Raport dokumentów dla {user.first_name} {user.last_name if user.last_name else ''}\n\n"
 
             urgent_docs = []
             soon_docs = []
             later_docs = []
 
-            for doc in documents:
-                if not doc.expiration_date:
-                    continue
-
-                days_left = (doc.expiration_date - current_date).days
-
+            for doc, days_left in expiring:
                 if days_left <= 30:
                     urgent_docs.append((doc, days_left))
                 elif days_left <= 90:
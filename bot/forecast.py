@@ -0,0 +1,122 @@
+"""
+Prognoza liczby przypomnień (Telegram, SMS, połączenia) na kolejne dni.
+
+Użycie:
+    python -m bot.forecast --days 90 --title legitymacja_studencka
+"""
+import argparse
+import math
+from datetime import datetime, timedelta, time
+
+import numpy as np
+import pytz
+
+from bot.config import (TELEGRAM_REMINDER_DAYS, SMS_REMINDER_DAYS, CALL_REMINDER_DAYS, DB_STREAM_FETCH_SIZE,
+                        DELIVERY_WINDOW_START, DELIVERY_WINDOW_END)
+from bot.triage import SECONDS_PER_DAY, CHANNELS, TriageBatch, triage
+from webapp.models import Document
+
+THRESHOLDS = {'telegram': TELEGRAM_REMINDER_DAYS, 'sms': SMS_REMINDER_DAYS, 'call': CALL_REMINDER_DAYS}
+LABELS = {'telegram': 'Telegram', 'sms': 'SMS', 'call': 'Połączenia'}
+BAR_WIDTH = 40
+
+
+def load_batch(until, title=None, fetch_size=DB_STREAM_FETCH_SIZE):
+    chunks = []
+    for rows in Document.iter_forecast_rows(until, title, fetch_size):
+        chunks.append(np.array(rows, dtype=np.float64).reshape(-1, 8))
+    columns = np.concatenate(chunks) if chunks else np.empty((0, 8))
+    return TriageBatch(
+        expiration=columns[:, 0],
+        reachable=columns[:, 1].astype(np.bool_),
+        telegram_sent=columns[:, 2].astype(np.bool_),
+        sms_sent=columns[:, 3].astype(np.bool_),
+        call_sent=columns[:, 4].astype(np.bool_),
+        call_attempts=columns[:, 5].astype(np.int32),
+        call_listened=columns[:, 6].astype(np.bool_),
+        last_call=columns[:, 7],
+    )
+
+
+def forecast(batch, now, days):
+    """
+    Liczba przypomnień na dzień i kanał w horyzoncie ``days`` dni, licząc od dziś (UTC).
+
+    Każdy dzień jest oceniany tymi samymi regułami co ReminderSystem (bot.triage.triage):
+    dokumenty bez telefonu właściciela są pomijane, zaległe progi nadrabiane są do wygaśnięcia
+    dokumentu, a kolejkowane przypomnienie ustawia flagę kanału, tak jak ReminderOutbox.enqueue,
+    więc nie jest liczone ponownie w kolejnych dniach.
+    """
+    today = math.floor(now / SECONDS_PER_DAY)
+    volumes = {channel: np.zeros(days, np.int64) for channel in CHANNELS}
+    sent = {'telegram': batch.telegram_sent, 'sms': batch.sms_sent, 'call': batch.call_sent}
+    for offset in range(days):
+        # The wake-up for a day's reminders fires at 00:00 UTC.
+        due = triage(batch, (today + offset) * SECONDS_PER_DAY)
+        for channel in CHANNELS:
+            volumes[channel][offset] = len(due[channel])
+            sent[channel][due[channel]] = True
+    return volumes
+
+
+def window_hours():
+    start = time.fromisoformat(DELIVERY_WINDOW_START)
+    end = time.fromisoformat(DELIVERY_WINDOW_END)
+    return ((end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)) / 60
+
+
+def render(volumes, start_day, days):
+    totals = sum(volumes.values())
+    scale = BAR_WIDTH / max(int(totals.max()), 1)
+    lines = [f"{'Dzień':<10} " + " ".join(f"{LABELS[channel]:>10}" for channel in CHANNELS) + f" {'Razem':>8}"]
+    for offset in range(days):
+        if not totals[offset]:
+            continue
+        day = start_day + timedelta(days=offset)
+        counts = " ".join(f"{int(volumes[channel][offset]):>10}" for channel in CHANNELS)
+        lines.append(f"{day:%Y-%m-%d} {counts} {int(totals[offset]):>8} {'#' * math.ceil(totals[offset] * scale)}")
+    lines.append(f"{'Suma':<10} " + " ".join(f"{int(volumes[channel].sum()):>10}" for channel in CHANNELS)
+                 + f" {int(totals.sum()):>8}")
+
+    # Reminders are spread evenly over the delivery window (DeliveryPlanner),
+    # so the busiest hour carries the day's volume divided by window length.
+    hours = window_hours()
+    lines.append("")
+    lines.append(f"Szczytowe obciążenie godzinowe (okno {DELIVERY_WINDOW_START}-{DELIVERY_WINDOW_END}, {hours:g} h):")
+    for channel in CHANNELS:
+        peak = int(volumes[channel].argmax())
+        per_hour = volumes[channel][peak] / hours
+        lines.append(f"  {LABELS[channel]:<10} {math.ceil(per_hour):>6}/h ({per_hour / 3600:.3f}/s) "
+                     f"w dniu {start_day + timedelta(days=peak):%Y-%m-%d}")
+    peak = int(totals.argmax())
+    lines.append(f"  {'Zapytania LLM':<10} {math.ceil(totals[peak] / hours):>6}/h "
+                 f"w dniu {start_day + timedelta(days=peak):%Y-%m-%d}")
+    return "\n".join(lines)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"wartość musi być dodatnia: {value}")
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prognoza liczby przypomnień na dzień i kanał.")
+    parser.add_argument('--days', type=positive_int, default=90, help="horyzont prognozy w dniach (domyślnie 90)")
+    parser.add_argument('--title', help="tylko dokumenty, których tytuł zawiera ten tekst")
+    parser.add_argument('--fetch-size', type=positive_int, default=DB_STREAM_FETCH_SIZE, help="wierszy na porcję odczytu")
+    args = parser.parse_args(argv)
+
+    now = datetime.now(pytz.UTC)
+    start_day = now.date()
+    # A reminder can fall inside the horizon for documents expiring up to the
+    # largest threshold after it.
+    until = now + timedelta(days=args.days + max(THRESHOLDS.values()) + 1)
+    batch = load_batch(until, args.title, args.fetch_size)
+    print(f"Dokumentów w zakresie: {len(batch)} (z numerem telefonu: {int(batch.reachable.sum())})")
+    print(render(forecast(batch, now.timestamp(), args.days), start_day, args.days))
+
+
+if __name__ == '__main__':
+    main()
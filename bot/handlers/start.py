@@ -12,7 +12,8 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InlineKeyboardMarkup, \
     InlineKeyboardButton
 
-from webapp.models import UserProfile, Document
+from webapp.models import Document
+from webapp.repository import UserProfileRepository, DocumentRepository
 
 router = Router()
 
@@ -48,18 +49,18 @@ async def cmd_help(message: Message):
     await message.answer(text, parse_mode="Markdown")
 
 
-def get_user_by_telegram_message(message_or_callback):
+async def get_user_by_telegram_message(message_or_callback):
     if hasattr(message_or_callback, 'from_user'):
         from_user = message_or_callback.from_user
     else:
         from_user = message_or_callback.from_user
 
-    user = UserProfile.get_by_telegram_id(from_user.id)
+    user = await UserProfileRepository.get_by_telegram_id(from_user.id)
 
     if not user and from_user.username:
-        user = UserProfile.get_by_username(from_user.username)
+        user = await UserProfileRepository.get_by_username(from_user.username)
         if user and not user.telegram_id:
-            user.update_telegram_id(from_user.id)
+            await UserProfileRepository.update_telegram_id(user, from_user.id)
 
     return user
 
@@ -67,13 +68,13 @@ def get_user_by_telegram_message(message_or_callback):
 @router.message(Command("documents"))
 async def cmd_my_documents(message: Message):
     try:
-        user = get_user_by_telegram_message(message)
+        user = await get_user_by_telegram_message(message)
 
         if not user:
             await message.answer("Nie jesteś zarejestrowany w systemie. Użyj /start aby się zarejestrować.")
             return
 
-        documents = Document.get_by_user_id(user.id)
+        documents = await DocumentRepository.get_by_user_id(user.id, Document.LIST_COLUMNS)
 
         if not documents:
             await message.answer("Nie masz żadnych dokumentów w systemie.")
@@ -115,21 +116,21 @@ async def cmd_my_documents(message: Message):
 async def save_user_contact(telegram_id, first_name, last_name, phone_number, username=None):
     try:
         # First try to find by telegram_id
-        user = UserProfile.get_by_telegram_id(telegram_id)
+        user = await UserProfileRepository.get_by_telegram_id(telegram_id)
 
         if not user and username:
             # If not found by telegram_id, try to find by username
-            user = UserProfile.get_by_username(username)
+            user = await UserProfileRepository.get_by_username(username)
             if user and not user.telegram_id:
                 # User exists but doesn't have telegram_id - update it
-                user.update_telegram_id(telegram_id)
+                await UserProfileRepository.update_telegram_id(user, telegram_id)
                 if user.phone != phone_number:
-                    user.update_phone(phone_number)
+                    await UserProfileRepository.update_phone(user, phone_number)
                 return user
 
         if not user:
             # Create new user if not found
-            user = UserProfile.create(
+            user = await UserProfileRepository.create(
                 telegram_id=telegram_id,
                 first_name=first_name,
                 last_name=last_name,
@@ -139,7 +140,7 @@ async def save_user_contact(telegram_id, first_name, last_name, phone_number, us
         else:
             # Update existing user's phone if different
             if user.phone != phone_number:
-                user.update_phone(phone_number)
+                await UserProfileRepository.update_phone(user, phone_number)
         return user
     except Exception as e:
         logging.error(f"Błąd podczas zapisywania kontaktu: {e}")
@@ -148,7 +149,7 @@ async def save_user_contact(telegram_id, first_name, last_name, phone_number, us
 
 async def save_document(user_id, file_id, name, mime_type, size, bot=None):
     try:
-        document = Document.create(
+        document = await DocumentRepository.create(
             user_id=user_id,
             file_id=file_id,
             title=name,
@@ -168,7 +169,7 @@ async def save_document(user_id, file_id, name, mime_type, size, bot=None):
                     document_name=name
                 )
 
-                document.update_gcs_path(gcs_path)
+                await DocumentRepository.update_gcs_path(document, gcs_path)
                 logging.info(f"Dokument {name} przesłany do GCS: {gcs_path}")
             except Exception as e:
                 logging.error(f"Nie udało się przesłać dokumentu do GCS: {e}")
@@ -185,14 +186,14 @@ async def cmd_start(message: Message, state: FSMContext):
 
     try:
         # First try to find by telegram_id
-        user = UserProfile.get_by_telegram_id(message.from_user.id)
+        user = await UserProfileRepository.get_by_telegram_id(message.from_user.id)
 
         # If not found by telegram_id, try by username
         if not user and message.from_user.username:
-            user = UserProfile.get_by_username(message.from_user.username)
+            user = await UserProfileRepository.get_by_username(message.from_user.username)
             if user and not user.telegram_id:
                 # User exists but doesn't have telegram_id - update it
-                user.update_telegram_id(message.from_user.id)
+                await UserProfileRepository.update_telegram_id(user, message.from_user.id)
 
         if user:
             keyboard = ReplyKeyboardMarkup(
@@ -378,9 +379,9 @@ async def process_day(callback_query: types.CallbackQuery, state: FSMContext):
     two_weeks_before = expiration_date - timedelta(weeks=2)
 
     try:
-        document = Document.get_by_id(user_data['document_id'])
+        document = await DocumentRepository.get_by_id(user_data['document_id'])
         if document:
-            document.update_expiration_date(expiration_date)
+            await DocumentRepository.update_expiration_date(document, expiration_date)
 
             if "reminder_system" in callback_query.bot.data:
                 reminder_system = callback_query.bot.data["reminder_system"]
@@ -429,14 +430,14 @@ async def cmd_get_document(message: Message):
 @router.callback_query(lambda c: c.data == "show_documents")
 async def show_documents_for_download(callback_query: types.CallbackQuery):
     try:
-        user = UserProfile.get_by_telegram_id(callback_query.from_user.id)
+        user = await UserProfileRepository.get_by_telegram_id(callback_query.from_user.id)
 
         if not user:
             await callback_query.message.answer(
                 "Nie jesteś zarejestrowany w systemie. Użyj /start aby się zarejestrować.")
             return
 
-        documents = Document.get_by_user_id(user.id)
+        documents = await DocumentRepository.get_by_user_id(user.id, Document.LIST_COLUMNS)
 
         if not documents:
             await callback_query.message.answer("Nie masz żadnych dokumentów w systemie.")
@@ -471,7 +472,7 @@ async def generate_download_link(callback_query: types.CallbackQuery):
     document_id = int(callback_query.data.split('_')[1])
 
     try:
-        document = Document.get_by_id(document_id)
+        document = await DocumentRepository.get_by_id(document_id)
 
         if not document:
             await callback_query.message.answer("Nie znaleziono dokumentu.")
@@ -513,13 +514,13 @@ async def generate_download_link(callback_query: types.CallbackQuery):
 @router.message(Command("analyze"))
 async def cmd_analyze_document(message: Message, state: FSMContext):
     try:
-        user = UserProfile.get_by_telegram_id(message.from_user.id)
+        user = await UserProfileRepository.get_by_telegram_id(message.from_user.id)
 
         if not user:
             await message.answer("Nie jesteś zarejestrowany. Użyj /start, aby się zarejestrować.")
             return
 
-        documents = Document.get_by_user_id(user.id)
+        documents = await DocumentRepository.get_by_user_id(user.id, Document.LIST_COLUMNS)
 
         if not documents:
             await message.answer("Nie masz żadnych dokumentów w systemie.")
@@ -582,13 +583,13 @@ async def analyze_document_callback(callback_query: types.CallbackQuery, crew_ma
 @router.message(Command("report"))
 async def cmd_document_report(message: Message, crew_manager=None, **kwargs):
     try:
-        user = UserProfile.get_by_telegram_id(message.from_user.id)
+        user = await UserProfileRepository.get_by_telegram_id(message.from_user.id)
 
         if not user:
             await message.answer("Nie jesteś zarejestrowany w systemie. Użyj /start aby się zarejestrować.")
             return
 
-        documents = Document.get_by_user_id(user.id)
+        documents = await DocumentRepository.get_by_user_id(user.id, Document.LIST_COLUMNS)
 
         if not documents:
             await message.answer("Nie masz żadnych dokumentów w systemie.")
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from bot.config import LEADER_LOCK_KEY, LEADER_HEARTBEAT_INTERVAL, REMINDER_INDEX_CHANNEL
+from webapp.database import get_db_connection
+from webapp.repository import run_db
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """
+    Wybór lidera oparty na blokadzie doradczej Postgresa (pg_try_advisory_lock).
+
+    Blokada jest trzymana na osobnym, niepulowanym połączeniu przez cały czas pełnienia roli
+    lidera. Co heartbeat_interval sekund lider sprawdza połączenie, a pozostałe procesy
+    ponawiają próbę przejęcia blokady. Gdy lider traci połączenie, Postgres zwalnia blokadę
+    i jeden z procesów zapasowych przejmuje jego zadania. To samo połączenie nasłuchuje
+    (LISTEN) powiadomień z kanału przekazywanego w ``channel``.
+    """
+
+    def __init__(self, on_elected, on_demoted, on_notify=None, lock_key=LEADER_LOCK_KEY,
+                 heartbeat_interval=LEADER_HEARTBEAT_INTERVAL, channel=REMINDER_INDEX_CHANNEL):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_notify = on_notify
+        self.lock_key = lock_key
+        self.heartbeat_interval = heartbeat_interval
+        self.channel = channel
+        self.is_leader = False
+        self._conn = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Zamknięcie połączenia zwalnia blokadę, więc proces zapasowy przejmie ją od razu.
+        self.is_leader = False
+        await run_db(self._close)
+
+    async def _run(self):
+        while True:
+            try:
+                if self.is_leader:
+                    alive, payloads = await run_db(self._heartbeat)
+                    if not alive:
+                        logger.error(f"Heartbeat lidera nie powiódł się (blokada {self.lock_key})")
+                        await self._demote()
+                    elif payloads and self.on_notify:
+                        await self.on_notify(payloads)
+                elif await run_db(self._try_acquire):
+                    self.is_leader = True
+                    logger.info(f"Przejęto rolę lidera (blokada {self.lock_key})")
+                    await self.on_elected()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Błąd wyboru lidera: {e}")
+                await self._demote()
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _demote(self):
+        was_leader, self.is_leader = self.is_leader, False
+        await run_db(self._close)
+        if was_leader:
+            logger.warning("Utracono rolę lidera")
+            await self.on_demoted()
+
+    def _try_acquire(self):
+        if self._conn is None or self._conn.closed:
+            # Keepalive pozwala wykryć zerwane połączenie, zanim heartbeat zawiśnie na długo.
+            # libpq accepts only integer keepalive values.
+            keepalive = max(1, int(self.heartbeat_interval))
+            self._conn = get_db_connection(keepalives=1, keepalives_idle=keepalive,
+                                           keepalives_interval=keepalive, keepalives_count=3)
+            self._conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self._conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+            acquired = cur.fetchone()[0]
+            if acquired and self.channel:
+                cur.execute(f"LISTEN {self.channel}")
+        return acquired
+
+    def _heartbeat(self):
+        if self._conn is None or self._conn.closed:
+            return False, []
+        # A bigint advisory key is split into classid (high half) and objid (low half).
+        with self._conn.cursor() as cur:
+            cur.execute("""
+                        SELECT EXISTS (SELECT 1
+                                       FROM pg_locks
+                                       WHERE locktype = 'advisory'
+                                         AND pid = pg_backend_pid()
+                                         AND classid = %s
+                                         AND objid = %s
+                                         AND objsubid = 1
+                                         AND granted)
+                        """, (self.lock_key >> 32, self.lock_key & 0xFFFFFFFF))
+            held = cur.fetchone()[0]
+        if not held:
+            return False, []
+        self._conn.poll()
+        payloads = [notify.payload for notify in self._conn.notifies]
+        del self._conn.notifies[:]
+        return True, payloads
+
+    def _close(self):
+        if self._conn is not None and not self._conn.closed:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.error(f"Błąd podczas zamykania połączenia lidera: {e}")
+        self._conn = None
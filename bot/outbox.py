@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from bot.config import (REMINDER_CONCURRENCY, REMINDER_LEASE_SECONDS, REMINDER_WORKER_ID, OUTBOX_POLL_INTERVAL,
+                        OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_MAX)
+from webapp.repository import ReminderOutboxRepository
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt, base=OUTBOX_BACKOFF_BASE, maximum=OUTBOX_BACKOFF_MAX):
+    # Exponential backoff with up to 10% jitter so failed items do not retry in lockstep.
+    delay = min(maximum, base * 2 ** (attempt - 1))
+    return delay + random.uniform(0, delay * 0.1)
+
+
+class OutboxWorker:
+    """
+    Pula asynchronicznych workerów opróżniających tabelę evoicebot_app_reminderoutbox.
+
+    Wiersze są pobierane przez FOR UPDATE SKIP LOCKED, więc workery na wielu replikach nie
+    dublują wysyłek. Nieudana próba wraca do kolejki z wykładniczym opóźnieniem, a po
+    max_attempts próbach wiersz przechodzi w stan "dead", a flaga kanału dokumentu zostaje
+    wyczyszczona, aby kolejny przebieg mógł ponowić przypomnienie. Każda próba jest
+    zapisywana wraz z czasem trwania.
+    """
+
+    def __init__(self, deliver, concurrency=REMINDER_CONCURRENCY, poll_interval=OUTBOX_POLL_INTERVAL,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS, lease_seconds=REMINDER_LEASE_SECONDS,
+                 worker_id=REMINDER_WORKER_ID):
+        self.deliver = deliver
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id
+        self._active = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Rozpoczęte wysyłki są kończone; niepobrane wiersze czekają na kolejny start.
+        if self._active:
+            await asyncio.gather(*self._active, return_exceptions=True)
+
+    def stats(self):
+        return {'active': len(self._active), 'sent': self.sent, 'failed': self.failed, 'dead': self.dead}
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            claimed = 0
+            free = self.concurrency - len(self._active)
+            if free > 0:
+                try:
+                    entries = await ReminderOutboxRepository.claim(self.worker_id, free, self.lease_seconds)
+                except Exception as e:
+                    logger.error(f"Błąd podczas pobierania wiadomości z outboxa: {e}")
+                    entries = []
+                for entry in entries:
+                    task = asyncio.create_task(self._process(entry))
+                    self._active.add(task)
+                    task.add_done_callback(self._done)
+                claimed = len(entries)
+
+            # A full batch means more work is probably waiting; otherwise sleep
+            # until the poll interval, a local enqueue or a finished delivery.
+            if claimed == 0 or claimed < free:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _done(self, task):
+        self._active.discard(task)
+        self._wakeup.set()
+
+    async def _process(self, entry):
+        started_at = datetime.now(pytz.UTC)
+        started = time.monotonic()
+        try:
+            await self.deliver(entry.channel, entry.document_id, entry.payload)
+        except Exception as e:
+            duration_ms = int((time.monotonic() - started) * 1000)
+            if entry.attempts >= self.max_attempts:
+                self.dead += 1
+                logger.error(f"Wiadomość {entry.id} ({entry.channel}, dokument {entry.document_id}) "
+                             f"przeniesiona do dead-letter po {entry.attempts} próbach: {e}")
+                retry_at = None
+            else:
+                self.failed += 1
+                retry_at = started_at + timedelta(seconds=backoff_delay(entry.attempts))
+                logger.warning(f"Próba {entry.attempts} wysyłki {entry.id} ({entry.channel}) nieudana, "
+                               f"ponowienie o {retry_at.isoformat()}: {e}")
+            await self._record(ReminderOutboxRepository.mark_failed, entry, str(e), started_at, duration_ms, retry_at)
+        else:
+            self.sent += 1
+            duration_ms = int((time.monotonic() - started) * 1000)
+            await self._record(ReminderOutboxRepository.mark_sent, entry, started_at, duration_ms)
+
+    async def _record(self, mark, entry, *args):
+        try:
+            await mark(entry, *args)
+        except Exception as e:
+            # The lease expires and the row is claimed again, so nothing is lost.
+            logger.error(f"Nie udało się zapisać wyniku wysyłki {entry.id}: {e}")
@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramRetryAfter
+from twilio.base.exceptions import TwilioRestException
+
+from bot.config import (TELEGRAM_RATE_LIMIT, TELEGRAM_CHAT_RATE_LIMIT, SMS_RATE_LIMIT, SMS_NUMBER_RATE_LIMIT,
+                        CALL_RATE_LIMIT, CALL_NUMBER_RATE_LIMIT, RATE_LIMIT_MAX_RETRIES, CATCHUP_RATE)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Kubełek tokenów: rate tokenów na sekundę, maksymalnie capacity naraz.
+
+    Wywołania acquire() czekają w kolejce FIFO zamiast kończyć się błędem.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.waiting = 0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+    def pause(self, seconds):
+        now = time.monotonic()
+        self._refill(now)
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        # Refill restarts when the pause ends, so no burst is credited for it.
+        self._tokens = 0
+        self._updated = self._blocked_until
+
+
+class CatchUpGovernor:
+    """
+    Rozkłada zaległe przypomnienia w czasie: każde kolejne dostaje termin 1/rate sekund później.
+
+    Terminy są liczone od ostatnio przydzielonego, więc zaległości z kolejnych przebiegów
+    ustawiają się w jednej kolejce zamiast nakładać się na siebie.
+    """
+
+    def __init__(self, rate=CATCHUP_RATE):
+        self.rate = rate
+        self._next_slot = 0.0
+
+    def schedule(self, now):
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1 / self.rate
+        return slot
+
+    def defer(self, slot):
+        # The slot just handed out was moved to ``slot``; later ones follow it.
+        self._next_slot = max(self._next_slot, slot + 1 / self.rate)
+
+    def backlog_seconds(self, now):
+        return max(0.0, self._next_slot - now)
+
+
+def retry_delay(error, attempt):
+    if isinstance(error, TelegramRetryAfter):
+        return error.retry_after
+    if isinstance(error, TwilioRestException) and error.status == 429:
+        return 2 ** attempt
+    return None
+
+
+class RateLimiter:
+    """
+    Ograniczanie tempa wysyłki per kanał (telegram, sms, call) i per odbiorca.
+
+    Nadmiarowe wysyłki czekają w kolejce; odpowiedzi "zwolnij" od dostawców
+    (RetryAfter z aiogram, 429 z Twilio) wstrzymują kubełek i ponawiają wysyłkę.
+    """
+
+    def __init__(self, limits=None, max_destinations=10000, max_retries=RATE_LIMIT_MAX_RETRIES):
+        self.limits = limits or {
+            'telegram': (TELEGRAM_RATE_LIMIT, TELEGRAM_CHAT_RATE_LIMIT),
+            'sms': (SMS_RATE_LIMIT, SMS_NUMBER_RATE_LIMIT),
+            'call': (CALL_RATE_LIMIT, CALL_NUMBER_RATE_LIMIT),
+        }
+        self.max_destinations = max_destinations
+        self.max_retries = max_retries
+        self._channels = {channel: TokenBucket(rate) for channel, (rate, _) in self.limits.items()}
+        self._destinations = {channel: OrderedDict() for channel in self.limits}
+
+    def _destination_bucket(self, channel, destination):
+        buckets = self._destinations[channel]
+        bucket = buckets.get(destination)
+        if bucket is None:
+            bucket = buckets[destination] = TokenBucket(self.limits[channel][1], capacity=1)
+            if len(buckets) > self.max_destinations:
+                for key in list(buckets):
+                    if len(buckets) <= self.max_destinations:
+                        break
+                    if buckets[key].waiting == 0 and key != destination:
+                        del buckets[key]
+        else:
+            buckets.move_to_end(destination)
+        return bucket
+
+    async def acquire(self, channel, destination=None):
+        if destination is not None:
+            await self._destination_bucket(channel, destination).acquire()
+        await self._channels[channel].acquire()
+
+    async def run(self, channel, destination, send):
+        # send() is called again on every retry, so it must create a new call each time.
+        attempt = 0
+        while True:
+            await self.acquire(channel, destination)
+            try:
+                result = send()
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning(f"Limit dostawcy dla kanału {channel}, ponowienie za {delay} s (próba {attempt})")
+                self._channels[channel].pause(delay)
+
+    def queue_depth(self):
+        return {
+            channel: self._channels[channel].waiting + sum(bucket.waiting for bucket in buckets.values())
+            for channel, buckets in self._destinations.items()
+        }
@@ -1,134 +1,418 @@
+import asyncio
+import heapq
 import logging
-from datetime import datetime, timedelta
+import zlib
+from datetime import datetime, time, timedelta
 
 import pytz
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.date import DateTrigger
 
-from bot.config import OPENAI_API_KEY
+from bot.config import (OPENAI_API_KEY, TELEGRAM_REMINDER_DAYS, SMS_REMINDER_DAYS, CALL_REMINDER_DAYS,
+                        TELEGRAM_CONCURRENCY, SMS_CONCURRENCY, CALL_CONCURRENCY,
+                        REMINDER_MISFIRE_GRACE_TIME, DUE_INDEX_HORIZON_DAYS, REMINDER_SCAN_LIMIT,
+                        REMINDER_CLAIM_BATCH_SIZE, REMINDER_WORKER_ID, INCREMENTAL_SCAN_INTERVAL,
+                        DELIVERY_WINDOW_START, DELIVERY_WINDOW_END, DELIVERY_TIMEZONE, REMINDER_DIGEST)
 from bot.crew_manager import CrewManager
-from webapp.models import UserProfile, Document, VoiceCall
+from bot.leader import LeaderElection
+from bot.outbox import OutboxWorker
+from bot.rate_limiter import RateLimiter, CatchUpGovernor
+from bot.triage import CHANNELS, TriageBatch, triage
+from bot.twilio_gateway import TwilioGateway
+from webapp.repository import (DocumentRepository, VoiceCallRepository, ReminderOutboxRepository,
+                               ReminderLedgerRepository)
+from webapp.state_writer import ReminderStateWriter
 
 logger = logging.getLogger(__name__)
 
 
+class DueIndex:
+    """Reminders due within the loaded window, earliest first.
+
+    Every entry is a single int ``due_ts << 40 | document_id << 2 | channel``,
+    so the heap orders by due time without per-entry tuples. A document has at
+    most one pending entry; superseded entries are dropped lazily when they
+    reach the top of the heap.
+    """
+
+    CHANNELS = CHANNELS
+    _TS_SHIFT = 40
+    _ID_MASK = (1 << 38) - 1
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self.loaded_until = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, document_id, due_at, channel):
+        due_ts = int(due_at.timestamp()) if due_at else None
+        if due_ts is None or due_ts >= self.loaded_until or channel not in self.CHANNELS:
+            # Nothing pending, or beyond the window: a later load picks it up.
+            self._entries.pop(document_id, None)
+            return
+        entry = (due_ts << self._TS_SHIFT) | (document_id << 2) | self.CHANNELS.index(channel)
+        if self._entries.get(document_id) != entry:
+            self._entries[document_id] = entry
+            heapq.heappush(self._heap, entry)
+
+    def next_due(self):
+        heap = self._heap
+        while heap and self._entries.get((heap[0] >> 2) & self._ID_MASK) != heap[0]:
+            heapq.heappop(heap)
+        return heap[0] >> self._TS_SHIFT if heap else None
+
+    def pop_due(self, now_ts):
+        due = []
+        while True:
+            due_ts = self.next_due()
+            if due_ts is None or due_ts > now_ts:
+                return due
+            entry = heapq.heappop(self._heap)
+            document_id = (entry >> 2) & self._ID_MASK
+            del self._entries[document_id]
+            due.append((document_id, self.CHANNELS[entry & 3]))
+
+
+class DeliveryPlanner:
+    """
+    Rozmieszcza przypomnienia w dziennym oknie wysyłki (czas lokalny).
+
+    Klucz i kanał wyznaczają przez CRC32 ułamek pozostałej części okna (od not_before
+    do końca okna), dzięki czemu przypomnienia z jednego dnia rozkładają się równomiernie.
+    Terminy po zamknięciu okna przechodzą do okna następnego dnia.
+    """
+
+    def __init__(self, start=DELIVERY_WINDOW_START, end=DELIVERY_WINDOW_END, timezone=DELIVERY_TIMEZONE):
+        self.timezone = pytz.timezone(timezone)
+        self.start = time.fromisoformat(start)
+        self.end = time.fromisoformat(end)
+
+    def _window(self, day):
+        return (self.timezone.localize(datetime.combine(day, self.start)),
+                self.timezone.localize(datetime.combine(day, self.end)))
+
+    def plan(self, key, channel, not_before):
+        day = not_before.astimezone(self.timezone).date()
+        start, end = self._window(day)
+        if not_before >= end:
+            start, end = self._window(day + timedelta(days=1))
+        start = max(start, not_before)
+        fraction = zlib.crc32(f"{key}:{channel}".encode()) / 2 ** 32
+        return (start + (end - start) * fraction).astimezone(pytz.UTC)
+
+    def within(self, moment):
+        # The moment itself if it falls inside a delivery window, otherwise
+        # the opening of the next window.
+        day = moment.astimezone(self.timezone).date()
+        start, end = self._window(day)
+        if moment >= end:
+            start, end = self._window(day + timedelta(days=1))
+        return max(start, moment).astimezone(pytz.UTC)
+
+
 class ReminderSystem:
-    def __init__(self, bot: Bot, crew_manager=None):
+    WAKEUP_JOB_ID = 'reminder_wakeup'
+    WATCHDOG_JOB_ID = 'reminder_wakeup_watchdog'
+    # The wake-up job re-arms itself while still running, so its next run must
+    # start after the current one; a run_date in the past would be skipped as a
+    # max_instances collision and the one-shot job dropped.
+    WAKEUP_MIN_DELAY = 1
+
+    def __init__(self, bot: Bot, crew_manager=None, twilio_gateway=None):
         self.bot = bot
-        self.scheduler = AsyncIOScheduler()
+        self.scheduler = AsyncIOScheduler(
+            job_defaults={
+                'coalesce': True,
+                'misfire_grace_time': REMINDER_MISFIRE_GRACE_TIME,
+                'max_instances': 1,
+            },
+            timezone=pytz.UTC
+        )
         self.crew_manager = crew_manager or CrewManager(api_key=OPENAI_API_KEY)
+        self.state_writer = ReminderStateWriter()
+        self.rate_limiter = RateLimiter()
+        self.catchup = CatchUpGovernor()
+        self.planner = DeliveryPlanner()
+        self.digest = REMINDER_DIGEST
+        self.twilio_gateway = twilio_gateway or TwilioGateway()
+        self.due_index = DueIndex()
+        self.worker_id = REMINDER_WORKER_ID
+        self._wake_delay = self.WAKEUP_MIN_DELAY
+
+        # Deliveries run in the outbox worker pool (REMINDER_CONCURRENCY at a
+        # time), and each channel additionally has its own limit.
+        self.outbox = OutboxWorker(self.deliver)
+        self._channel_slots = {
+            'telegram': asyncio.Semaphore(TELEGRAM_CONCURRENCY),
+            'sms': asyncio.Semaphore(SMS_CONCURRENCY),
+            'call': asyncio.Semaphore(CALL_CONCURRENCY),
+        }
+
+        # Only the elected leader runs the wake-up job; other replicas stay hot
+        # standbys and keep handling Telegram updates.
+        self.leader = LeaderElection(self._on_elected, self._on_demoted, self._on_index_notify)
 
-        self.scheduler.add_job(
-            self.check_all_documents,
-            'date',
-            run_date=datetime.now() + timedelta(seconds=5),
-            id='check_documents_now'
-        )
+        self.scheduler.start()
+        self.leader.start()
+        self.outbox.start()
+        logger.info("System przypomnień uruchomiony z integracją Crew AI")
 
+    async def _on_elected(self):
+        # A single wake-up job follows the head of the due index; the first
+        # run loads the index from the materialized next_reminder_at column.
+        self.due_index = DueIndex()
+        self.scheduler.add_job(self._wake, 'date', run_date=datetime.now(pytz.UTC), id=self.WAKEUP_JOB_ID,
+                               replace_existing=True)
+        # Safety net: if the wake-up job is ever lost, the watchdog re-arms it.
+        self.scheduler.add_job(self._watchdog, 'interval', seconds=INCREMENTAL_SCAN_INTERVAL,
+                               id=self.WATCHDOG_JOB_ID, replace_existing=True)
+
+    async def _on_demoted(self):
+        for job_id in (self.WAKEUP_JOB_ID, self.WATCHDOG_JOB_ID):
+            if self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+        self.due_index = DueIndex()
+
+    async def _watchdog(self):
+        if self.leader.is_leader and self.scheduler.get_job(self.WAKEUP_JOB_ID) is None:
+            logger.warning("Brak zadania wybudzenia przypomnień, ponowne uzbrojenie")
+            self._arm_wakeup()
+
+    async def _on_index_notify(self, payloads):
+        document_ids = [int(document_id) for payload in payloads for document_id in payload.split(",") if document_id]
+        await self._reindex(document_ids)
+        self._arm_wakeup()
+
+    async def _load_due_index(self, now):
+        # Day-bucketed windows: each load reads only the reminders that fall
+        # before the start of the day after the horizon.
+        after = datetime.fromtimestamp(self.due_index.loaded_until, pytz.UTC) if self.due_index.loaded_until else None
+        until = (now + timedelta(days=DUE_INDEX_HORIZON_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.due_index.loaded_until = int(until.timestamp())
+
+        async for rows in DocumentRepository.stream_next_reminders(until, after):
+            for document_id, due_at, channel in rows:
+                self.due_index.push(document_id, due_at, channel)
+        logger.info(f"Indeks przypomnień załadowany do {until.isoformat()}: {len(self.due_index)} pozycji")
+
+    async def _reindex(self, document_ids):
+        document_ids = set(document_ids)
+        for document_id, due_at, channel in await DocumentRepository.get_next_reminders(document_ids):
+            document_ids.discard(document_id)
+            self.due_index.push(document_id, due_at, channel)
+        for document_id in document_ids:
+            self.due_index.push(document_id, None, None)
+
+    def _arm_wakeup(self):
+        if not self.leader.is_leader:
+            return
+        next_due = self.due_index.next_due()
+        wake_ts = self.due_index.loaded_until if next_due is None else min(next_due, self.due_index.loaded_until)
+        # Wake at least every INCREMENTAL_SCAN_INTERVAL to pick up documents
+        # changed outside the bot.
+        now_ts = datetime.now(pytz.UTC).timestamp()
+        wake_ts = min(wake_ts, now_ts + INCREMENTAL_SCAN_INTERVAL)
+        # Rows left due (scan limit hit, leases held by a crashed leader, failed
+        # enqueue) are retried after _wake_delay instead of at a run_date
+        # already past; the delay backs off while passes make no progress.
+        wake_ts = max(wake_ts, now_ts + self._wake_delay)
         self.scheduler.add_job(
-            self.check_all_documents,
-            'interval',
-            hours=1,
-            id='check_documents_hourly'
+            self._wake,
+            'date',
+            run_date=datetime.fromtimestamp(wake_ts, pytz.UTC),
+            id=self.WAKEUP_JOB_ID,
+            replace_existing=True
         )
 
-        self.scheduler.start()
-        logger.info("System przypomnień uruchomiony z integracją Crew AI")
+    async def _wake(self):
+        now = datetime.now(pytz.UTC)
+        handled = []
+        try:
+            if now.timestamp() >= self.due_index.loaded_until:
+                await self._load_due_index(now)
+            for document_id, due_at, channel in await DocumentRepository.refresh_changed_documents():
+                self.due_index.push(document_id, due_at, channel)
+            due = self.due_index.pop_due(now.timestamp())
+            handled = await self.check_all_documents()
+            await self._reindex([document_id for document_id, _ in due] + handled)
+        except Exception as e:
+            logger.error(f"Błąd podczas obsługi indeksu przypomnień: {e}")
+        finally:
+            next_due = self.due_index.next_due()
+            if handled or next_due is None or next_due > datetime.now(pytz.UTC).timestamp():
+                self._wake_delay = self.WAKEUP_MIN_DELAY
+            else:
+                # Still due but nothing was claimed (database down, rows leased
+                # by another worker): back off up to INCREMENTAL_SCAN_INTERVAL.
+                self._wake_delay = min(self._wake_delay * 2, INCREMENTAL_SCAN_INTERVAL)
+                logger.warning(f"Przebieg przypomnień bez postępu, kolejna próba za {self._wake_delay} s")
+            self._arm_wakeup()
 
     async def check_all_documents(self):
         logger.info("Sprawdzanie wszystkich dokumentów z użyciem Crew AI...")
         current_date = datetime.now(pytz.UTC)
+        tomorrow = (current_date + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
 
+        handled = []
         try:
-            documents = Document.get_expiring_documents()
-            logger.info(f"Znaleziono {len(documents)} dokumentów")
-
-            for doc in documents:
-                if not doc.expiration_date:
-                    continue
-
-                days_diff = (doc.expiration_date.date() - current_date.date()).days
-                user = UserProfile.get_by_id(doc.user_id)
-
-                if not user or not user.phone:
-                    logger.warning(f"Brak użytkownika lub numeru telefonu dla dokumentu {doc.id}")
-                    continue
-
-                logger.info(f"Dokument {doc.title}: pozostało {days_diff} dni")
-
-                if days_diff == 30 and not doc.telegram_reminder_sent:
-                    logger.info(f"Wysyłanie wiadomości Telegram dla dokumentu {doc.id} ({doc.title})")
-                    await self.send_telegram_reminder(user.telegram_id, user.id, doc.id, doc.title, doc.expiration_date)
-                    doc.update_telegram_reminder_sent(True)
-
-                if days_diff == 21 and not doc.sms_reminder_sent:
-                    logger.info(f"Wysyłanie SMS dla dokumentu {doc.id} ({doc.title})")
-                    await self.send_sms_reminder(user.id, doc.id, user.phone, doc.title, doc.expiration_date)
-                    doc.update_sms_reminder_sent(True)
-
-                if days_diff == 14 and not doc.call_reminder_sent:
-                    if doc.call_attempts == 0 or not doc.call_message_listened:
-                        retry_needed = True
-                        if doc.call_attempts > 0 and doc.last_call_date:
-                            from bot.config import CALL_RETRY_DAYS
-                            days_since_last_call = (current_date - doc.last_call_date).days
-                            retry_needed = days_since_last_call >= CALL_RETRY_DAYS
-
-                        if retry_needed:
-                            logger.info(
-                                f"Wykonywanie połączenia głosowego dla dokumentu {doc.id} ({doc.title}) - próba {doc.call_attempts + 1}")
-                            await self.make_voice_call(user.id, doc.id, user.phone, doc.title, doc.expiration_date)
-
-            logger.info("Zakończono sprawdzanie dokumentów")
+            # Due documents are leased in batches, so several replicas can
+            # share a heavy day without sending the same reminder twice.
+            while len(handled) < REMINDER_SCAN_LIMIT:
+                documents = await DocumentRepository.claim_due_documents(
+                    self.worker_id, current_date, min(REMINDER_CLAIM_BATCH_SIZE, REMINDER_SCAN_LIMIT - len(handled))
+                )
+                if not documents:
+                    break
+                handled.extend(doc.id for doc in documents)
+
+                planned, idle = self.process_documents(documents, current_date)
+                entries = list(self._pace(planned, current_date))
+
+                # Delivery happens in the outbox workers; the scan only queues.
+                await ReminderOutboxRepository.enqueue(entries, digest=self.digest)
+                # Documents that came due but need nothing now (no phone number,
+                # call retry not yet due) are looked at again tomorrow.
+                await DocumentRepository.defer_next_reminders(idle, tomorrow)
+                if entries:
+                    self.outbox.wake()
+
+            logger.info(f"Zakończono sprawdzanie dokumentów, przetworzono {len(handled)} dokumentów, "
+                        f"outbox: {self.outbox.stats()}, kolejki wysyłki: {self.rate_limiter.queue_depth()}, "
+                        f"zaległości: {self.catchup.backlog_seconds(current_date.timestamp()):.0f} s")
         except Exception as e:
             logger.error(f"Błąd podczas sprawdzania dokumentów: {e}")
+        finally:
+            try:
+                await DocumentRepository.release_leases(handled, self.worker_id)
+            except Exception as e:
+                logger.error(f"Nie udało się zwolnić dzierżaw dokumentów: {e}")
+        return handled
+
+    def _pace(self, entries, current_date):
+        # Reminders due today get a jittered slot in the delivery window. Ones
+        # whose threshold day has already passed (downtime, failed pass) are
+        # paced by the catch-up governor instead; a slot outside the window
+        # moves to the next window opening and the backlog continues from there.
+        today = current_date.date()
+        for document_id, channel, threshold_date, payload in entries:
+            if threshold_date < today:
+                slot = datetime.fromtimestamp(self.catchup.schedule(current_date.timestamp()), pytz.UTC)
+                available_at = self.planner.within(slot)
+                if available_at > slot:
+                    self.catchup.defer(available_at.timestamp())
+            else:
+                # Digests share one slot per user so their documents land together.
+                slot_key = f"user{payload['user_id']}" if self.digest else document_id
+                available_at = self.planner.plan(slot_key, channel, current_date)
+            yield document_id, channel, threshold_date, payload, available_at
+
+    async def deliver(self, channel, document_id, payload):
+        if 'documents' in payload:
+            return await self.deliver_digest(channel, payload)
+
+        # Rows queued before the ledger existed carry no ledger_id.
+        ledger = await ReminderLedgerRepository.get_by_id(payload['ledger_id']) if payload.get('ledger_id') else None
+        if ledger is not None and ledger.status == ledger.SENT:
+            # Already delivered by an earlier attempt whose outcome was not recorded.
+            logger.info(f"Pominięto przypomnienie {channel} dla dokumentu {document_id}: już wysłane")
+            return
+
+        await self._deliver_one(channel, document_id, payload, payload['title'], payload['expiration_date'], ledger)
+
+    async def _deliver_one(self, channel, document_id, recipient, title, expiration_date, ledger):
+        expiration_date = datetime.fromisoformat(expiration_date)
+        if channel == 'telegram':
+            await self._limited('telegram', self.send_telegram_reminder, recipient['telegram_id'],
+                                recipient['user_id'], document_id, title, expiration_date, ledger)
+        elif channel == 'sms':
+            await self._limited('sms', self.send_sms_reminder, recipient['user_id'], document_id,
+                                recipient['phone'], title, expiration_date, ledger)
+        elif channel == 'call':
+            await self._limited('call', self.make_voice_call, recipient['user_id'], document_id,
+                                recipient['phone'], title, expiration_date, ledger)
+        else:
+            raise ValueError(f"Nieznany kanał przypomnienia: {channel}")
+
+    async def deliver_digest(self, channel, payload):
+        pending = []
+        for item in payload['documents']:
+            ledger = await ReminderLedgerRepository.get_by_id(item['ledger_id'])
+            if ledger is not None and ledger.status != ledger.SENT:
+                pending.append((item, ledger))
+
+        if not pending:
+            logger.info(f"Pominięto zbiorcze przypomnienie {channel} dla użytkownika {payload['user_id']}: już wysłane")
+            return
+        if len(pending) == 1:
+            item, ledger = pending[0]
+            await self._deliver_one(channel, item['document_id'], payload, item['title'], item['expiration_date'],
+                                    ledger)
+            return
+
+        await self._limited(channel, self.send_digest_reminder, channel, payload, pending)
+
+    async def _reminder_message(self, ledger, user_id, document_id, reminder_type):
+        # Retries reuse the text generated by the first attempt instead of
+        # asking the LLM again.
+        if ledger is not None and ledger.message:
+            return ledger.message
+        message = await self.crew_manager.generate_custom_reminder(user_id, document_id, reminder_type)
+        if message and ledger is not None:
+            await ReminderLedgerRepository.save_message(ledger, message)
+        return message
+
+    async def _limited(self, channel, send, *args):
+        async with self._channel_slots[channel]:
+            return await send(*args)
+
+    def process_documents(self, documents, current_date):
+        # One vectorized pass decides the due channels for the whole batch;
+        # only the selected rows are turned into outbox entries.
+        due = triage(TriageBatch.from_documents(documents), current_date.timestamp())
+        thresholds = {'telegram': TELEGRAM_REMINDER_DAYS, 'sms': SMS_REMINDER_DAYS, 'call': CALL_REMINDER_DAYS}
+        payloads = {}
+        entries = []
+        for channel in CHANNELS:
+            for index in due[channel]:
+                doc = documents[index]
+                payload = payloads.get(index)
+                if payload is None:
+                    user = doc.owner
+                    payload = payloads[index] = {
+                        'user_id': user.id,
+                        'telegram_id': user.telegram_id,
+                        'phone': user.phone,
+                        'title': doc.title,
+                        'expiration_date': doc.expiration_date.isoformat(),
+                    }
+                threshold_date = doc.expiration_date.astimezone(pytz.UTC).date() - timedelta(days=thresholds[channel])
+                entries.append((doc.id, channel, threshold_date, payload))
+
+        logger.info(f"Triage partii {len(documents)} dokumentów: "
+                    + ", ".join(f"{channel}={len(due[channel])}" for channel in CHANNELS))
+        return entries, [documents[index].id for index in due['idle']]
 
     async def schedule_document_reminders(self, user_id, document_id, expiration_date):
         try:
-            user = UserProfile.get_by_id(user_id)
-            document = Document.get_by_id(document_id)
-
-            if not user or not document:
-                logger.error(f"Nie znaleziono użytkownika lub dokumentu: user_id={user_id}, document_id={document_id}")
-                return
-
-            exp_date = datetime.fromisoformat(expiration_date) if isinstance(expiration_date, str) else expiration_date
-            one_month_before = exp_date - timedelta(days=30)
-            three_weeks_before = exp_date - timedelta(weeks=3)
-            two_weeks_before = exp_date - timedelta(weeks=2)
-
-            self.scheduler.add_job(
-                self.send_telegram_reminder,
-                DateTrigger(run_date=one_month_before),
-                args=[user.telegram_id, user_id, document_id, document.title, exp_date],
-                id=f"telegram_{document_id}_{user_id}"
-            )
-
-            self.scheduler.add_job(
-                self.send_sms_reminder,
-                DateTrigger(run_date=three_weeks_before),
-                args=[user_id, document_id, user.phone, document.title, exp_date],
-                id=f"sms_{document_id}_{user_id}"
-            )
-
-            self.scheduler.add_job(
-                self.make_voice_call,
-                DateTrigger(run_date=two_weeks_before),
-                args=[user_id, document_id, user.phone, document.title, exp_date],
-                id=f"call_{document_id}_{user_id}"
-            )
-
+            # next_reminder_at was refreshed together with the expiration date;
+            # re-uploads simply replace the document's entry in the index.
+            if self.leader.is_leader:
+                await self._reindex([document_id])
+                self._arm_wakeup()
+            else:
+                await DocumentRepository.notify_reminder_changed([document_id])
             logger.info(f"Zaplanowano przypomnienia dla dokumentu {document_id} dla użytkownika {user_id}")
 
         except Exception as e:
             logger.error(f"Błąd podczas planowania przypomnień: {e}")
 
-    async def send_telegram_reminder(self, telegram_id, user_id, document_id, document_name, expiration_date):
+    async def send_telegram_reminder(self, telegram_id, user_id, document_id, document_name, expiration_date,
+                                     ledger=None):
         try:
-            custom_message = await self.crew_manager.generate_custom_reminder(
-                user_id, document_id, 'telegram'
-            )
+            custom_message = await self._reminder_message(ledger, user_id, document_id, 'telegram')
 
             if custom_message:
                 message = custom_message
@@ -139,24 +423,23 @@ class ReminderSystem:
                     f"({formatted_date}). Proszę zaplanować jego odnowienie."
                 )
 
-            await self.bot.send_message(telegram_id, message, parse_mode="Markdown")
+            sent = await self.rate_limiter.run(
+                'telegram', telegram_id,
+                lambda: self.bot.send_message(telegram_id, message, parse_mode="Markdown")
+            )
             logger.info(f"Wysłano przypomnienie na Telegramie do użytkownika {telegram_id}")
 
-            document = Document.get_by_id(document_id)
-            if document:
-                document.update_telegram_reminder_sent(True)
+            if ledger is not None:
+                await ReminderLedgerRepository.mark_sent(ledger, str(sent.message_id))
 
         except Exception as e:
             logger.error(f"Nie udało się wysłać przypomnienia na Telegramie: {e}")
+            raise
 
-    async def send_sms_reminder(self, user_id, document_id, phone_number, document_name, expiration_date):
-        from twilio.rest import Client
-        from bot.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
-
+    async def send_sms_reminder(self, user_id, document_id, phone_number, document_name, expiration_date,
+                                ledger=None):
         try:
-            custom_message = await self.crew_manager.generate_custom_reminder(
-                user_id, document_id, 'sms'
-            )
+            custom_message = await self._reminder_message(ledger, user_id, document_id, 'sms')
 
             if custom_message:
                 message_text = custom_message
@@ -166,40 +449,107 @@ class ReminderSystem:
 
             logger.info(f"Próba wysłania SMS do {phone_number}: {message_text}")
 
-            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-            message = client.messages.create(
-                body=message_text,
-                from_=TWILIO_PHONE_NUMBER,
-                to=f'+{phone_number}'
+            message = await self.rate_limiter.run(
+                'sms', phone_number,
+                lambda: self.twilio_gateway.send_sms(f'+{phone_number}', message_text)
             )
             logger.info(f"SMS wysłany do numeru {phone_number}: {message.sid}")
 
-            document = Document.get_by_id(document_id)
-            if document:
-                document.update_sms_reminder_sent(True)
+            if ledger is not None:
+                await ReminderLedgerRepository.mark_sent(ledger, message.sid)
 
             return True
         except Exception as e:
             logger.error(f"Błąd podczas wysyłania SMS: {e}")
-            return False
+            raise
 
-    async def make_voice_call(self, user_id, document_id, phone_number, document_name, expiration_date):
-        from twilio.rest import Client
+    async def send_digest_reminder(self, channel, recipient, pending):
         from twilio.twiml.voice_response import VoiceResponse
-        from bot.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, COMPANY_NAME
+        from bot.config import COMPANY_NAME
 
+        user_id = recipient['user_id']
+        document_ids = [item['document_id'] for item, _ in pending]
+        ledgers = [ledger for _, ledger in pending]
         try:
-            document = Document.get_by_id(document_id)
+            # One LLM request for the whole group; retries reuse its text. The
+            # crew manager falls back to its own template when the LLM fails.
+            message = next((ledger.message for ledger in ledgers if ledger.message), None)
+            if message is None:
+                message = await self.crew_manager.generate_digest_reminder(
+                    user_id, document_ids, 'voice' if channel == 'call' else channel
+                )
+                if not message:
+                    raise ValueError(f"Nie udało się przygotować zbiorczego przypomnienia dla użytkownika {user_id}")
+                for ledger in ledgers:
+                    await ReminderLedgerRepository.save_message(ledger, message)
+
+            if channel == 'telegram':
+                telegram_id = recipient['telegram_id']
+                sent = await self.rate_limiter.run(
+                    'telegram', telegram_id,
+                    lambda: self.bot.send_message(telegram_id, message, parse_mode="Markdown")
+                )
+                provider_ref = str(sent.message_id)
+            elif channel == 'sms':
+                phone_number = recipient['phone']
+                sent = await self.rate_limiter.run(
+                    'sms', phone_number,
+                    lambda: self.twilio_gateway.send_sms(f'+{phone_number}', message)
+                )
+                provider_ref = sent.sid
+            elif channel == 'call':
+                phone_number = recipient['phone']
+                for document_id in document_ids:
+                    await self.state_writer.mark(document_id, call_attempts_delta=1, last_call_date=datetime.now())
+
+                response = VoiceResponse()
+                full_message = (f"Dzień dobry. Tutaj automatyczny system powiadomień firmy {COMPANY_NAME}. "
+                                + message + " Dziękujemy za uwagę.")
+                response.say(full_message, language="pl-PL", voice="Polly.Maja")
+                sent = await self.rate_limiter.run(
+                    'call', phone_number,
+                    lambda: self.twilio_gateway.create_call(f'+{phone_number}', str(response))
+                )
+                provider_ref = sent.sid
+
+                for document_id in document_ids:
+                    await self.state_writer.mark(document_id, call_message_listened=True)
+                await VoiceCallRepository.create(
+                    sid=sent.sid,
+                    to_number=phone_number,
+                    from_number=self.twilio_gateway.from_number,
+                    message_text=full_message,
+                    document_id=document_ids[0],
+                    user_profile_id=user_id
+                )
+            else:
+                raise ValueError(f"Nieznany kanał przypomnienia: {channel}")
+
+            for ledger in ledgers:
+                await ReminderLedgerRepository.mark_sent(ledger, provider_ref)
+            logger.info(f"Wysłano zbiorcze przypomnienie {channel} do użytkownika {user_id} "
+                        f"({len(document_ids)} dokumentów)")
+            return provider_ref
+        except Exception as e:
+            logger.error(f"Błąd podczas wysyłania zbiorczego przypomnienia {channel}: {e}")
+            raise
+
+    async def make_voice_call(self, user_id, document_id, phone_number, document_name, expiration_date,
+                              ledger=None):
+        from twilio.twiml.voice_response import VoiceResponse
+        from bot.config import COMPANY_NAME
+
+        try:
+            document = await DocumentRepository.get_by_id(document_id)
             if not document:
                 logger.error(f"Nie znaleziono dokumentu: {document_id}")
                 return None
 
-            document.increment_call_attempts()
-            call_attempt = document.call_attempts
+            # The attempt is persisted before dialing so a crash cannot hide it.
+            await self.state_writer.mark(document_id, call_attempts_delta=1, last_call_date=datetime.now())
+            call_attempt = document.call_attempts + 1
 
-            custom_message = await self.crew_manager.generate_custom_reminder(
-                user_id, document_id, 'voice'
-            )
+            custom_message = await self._reminder_message(ledger, user_id, document_id, 'voice')
 
             if custom_message:
                 voice_text = custom_message
@@ -219,23 +569,22 @@ class ReminderSystem:
             full_message = greeting_text + voice_text + " Dziękujemy za uwagę."
             response.say(full_message, language="pl-PL", voice="Polly.Maja")
 
-            client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-
-            call = client.calls.create(
-                twiml=str(response),
-                to=f'+{phone_number}',
-                from_=TWILIO_PHONE_NUMBER
+            call = await self.rate_limiter.run(
+                'call', phone_number,
+                lambda: self.twilio_gateway.create_call(f'+{phone_number}', str(response))
             )
 
             logger.info(f"Połączenie głosowe bez interaktywności do numeru {phone_number} zainicjowane: {call.sid}")
 
-            document.update_call_message_listened(True)
-            document.update_call_reminder_sent(True)
+            if ledger is not None:
+                await ReminderLedgerRepository.mark_sent(ledger, call.sid)
 
-            VoiceCall.create(
+            await self.state_writer.mark(document_id, call_message_listened=True)
+
+            await VoiceCallRepository.create(
                 sid=call.sid,
                 to_number=phone_number,
-                from_number=TWILIO_PHONE_NUMBER,
+                from_number=self.twilio_gateway.from_number,
                 message_text=full_message,
                 document_id=document_id,
                 user_profile_id=user_id
@@ -244,4 +593,5 @@ class ReminderSystem:
             return call.sid
         except Exception as e:
             logger.error(f"Błąd podczas wykonywania połączenia głosowego: {e}")
-            return None
+            raise
+
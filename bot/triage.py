@@ -0,0 +1,83 @@
+import numpy as np
+
+from bot.config import TELEGRAM_REMINDER_DAYS, SMS_REMINDER_DAYS, CALL_REMINDER_DAYS, CALL_RETRY_DAYS
+
+SECONDS_PER_DAY = 86400
+CHANNELS = ('telegram', 'sms', 'call')
+
+
+def _epoch(value):
+    return value.timestamp() if value else np.nan
+
+
+class TriageBatch:
+    """
+    Kolumnowy bufor partii dokumentów do klasyfikacji progów przypomnień.
+
+    Daty są przechowywane jako sekundy epoki (float64, NaN dla braku wartości),
+    a flagi jako tablice bool, dzięki czemu triage() działa na całych kolumnach naraz.
+    """
+
+    __slots__ = ('expiration', 'reachable', 'telegram_sent', 'sms_sent', 'call_sent', 'call_attempts',
+                 'call_listened', 'last_call')
+
+    def __init__(self, expiration, reachable, telegram_sent, sms_sent, call_sent, call_attempts,
+                 call_listened, last_call):
+        self.expiration = expiration
+        self.reachable = reachable
+        self.telegram_sent = telegram_sent
+        self.sms_sent = sms_sent
+        self.call_sent = call_sent
+        self.call_attempts = call_attempts
+        self.call_listened = call_listened
+        self.last_call = last_call
+
+    def __len__(self):
+        return len(self.expiration)
+
+    @classmethod
+    def from_documents(cls, documents):
+        count = len(documents)
+        return cls(
+            expiration=np.fromiter((_epoch(doc.expiration_date) for doc in documents), np.float64, count),
+            reachable=np.fromiter((bool(doc.owner and doc.owner.phone) for doc in documents), np.bool_, count),
+            telegram_sent=np.fromiter((bool(doc.telegram_reminder_sent) for doc in documents), np.bool_, count),
+            sms_sent=np.fromiter((bool(doc.sms_reminder_sent) for doc in documents), np.bool_, count),
+            call_sent=np.fromiter((bool(doc.call_reminder_sent) for doc in documents), np.bool_, count),
+            call_attempts=np.fromiter((doc.call_attempts or 0 for doc in documents), np.int32, count),
+            call_listened=np.fromiter((bool(doc.call_message_listened) for doc in documents), np.bool_, count),
+            last_call=np.fromiter((_epoch(doc.last_call_date) for doc in documents), np.float64, count),
+        )
+
+
+def days_left(expiration, now):
+    # Whole UTC calendar days between today and the expiration day (NaN if unknown).
+    return np.floor(expiration / SECONDS_PER_DAY) - np.floor(now / SECONDS_PER_DAY)
+
+
+def triage(batch, now):
+    """
+    Wyznacza w jednym przebiegu wektorowym, które kanały są należne dla każdego dokumentu.
+
+    Zwraca słownik kanał -> tablica indeksów dokumentów w partii oraz klucz 'idle'
+    z indeksami dokumentów, dla których nic nie trzeba wysyłać. Reguły odpowiadają
+    oknom progów: days_left <= próg, przypomnienie niewysłane, dokument jeszcze ważny.
+    """
+    remaining = days_left(batch.expiration, now)
+    active = batch.reachable & (remaining >= 0)
+
+    telegram = active & (remaining <= TELEGRAM_REMINDER_DAYS) & ~batch.telegram_sent
+    sms = active & (remaining <= SMS_REMINDER_DAYS) & ~batch.sms_sent
+
+    first_call = batch.call_attempts == 0
+    days_since_call = np.floor((now - batch.last_call) / SECONDS_PER_DAY)
+    retry_due = first_call | np.isnan(batch.last_call) | (days_since_call >= CALL_RETRY_DAYS)
+    call = (active & (remaining <= CALL_REMINDER_DAYS) & ~batch.call_sent
+            & (first_call | ~batch.call_listened) & retry_due)
+
+    return {
+        'telegram': np.flatnonzero(telegram),
+        'sms': np.flatnonzero(sms),
+        'call': np.flatnonzero(call),
+        'idle': np.flatnonzero(~(telegram | sms | call)),
+    }
@@ -0,0 +1,44 @@
+import logging
+
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.rest import Client
+
+from bot.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
+
+logger = logging.getLogger(__name__)
+
+
+class TwilioGateway:
+    """
+    Współdzielony klient Twilio tworzony raz przy starcie bota.
+
+    Korzysta z asynchronicznego klienta HTTP Twilio (sesja aiohttp z pulą połączeń keep-alive),
+    więc wysyłka SMS i inicjowanie połączeń nie blokują pętli zdarzeń.
+    """
+
+    def __init__(self, account_sid=TWILIO_ACCOUNT_SID, auth_token=TWILIO_AUTH_TOKEN,
+                 from_number=TWILIO_PHONE_NUMBER):
+        self.from_number = from_number
+        # No transport-level retries: messages.create and calls.create are not
+        # idempotent, so a retried 5xx could send a second SMS or place a second
+        # call. Failed sends are retried by the outbox, which checks the ledger.
+        self.http_client = AsyncTwilioHttpClient(pool_connections=True)
+        self.client = Client(account_sid, auth_token, http_client=self.http_client)
+        logger.info("Zainicjalizowano klienta Twilio z pulą połączeń HTTP")
+
+    async def send_sms(self, to, body):
+        return await self.client.messages.create_async(
+            body=body,
+            from_=self.from_number,
+            to=to
+        )
+
+    async def create_call(self, to, twiml):
+        return await self.client.calls.create_async(
+            twiml=twiml,
+            to=to,
+            from_=self.from_number
+        )
+
+    async def close(self):
+        await self.http_client.close()
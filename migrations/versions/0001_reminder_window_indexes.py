@@ -0,0 +1,44 @@
+"""reminder window indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REMINDER_FLAGS = ('telegram_reminder_sent', 'sms_reminder_sent', 'call_reminder_sent')
+
+
+def upgrade() -> None:
+    # One partial index per channel: each covers only documents whose reminder
+    # for that channel is still pending, so the hourly window query reads
+    # only rows inside the requested expiration_date range.
+    for flag in REMINDER_FLAGS:
+        op.create_index(
+            f'ix_document_expiration_{flag.split("_")[0]}_pending',
+            'evoicebot_app_document',
+            ['expiration_date'],
+            postgresql_where=sa.text(f'expiration_date IS NOT NULL AND NOT {flag}'),
+        )
+
+    op.create_index(
+        'ix_document_user_profile_created',
+        'evoicebot_app_document',
+        ['user_profile_id', sa.text('created_at DESC')],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_user_profile_created', table_name='evoicebot_app_document')
+    for flag in reversed(REMINDER_FLAGS):
+        op.drop_index(f'ix_document_expiration_{flag.split("_")[0]}_pending', table_name='evoicebot_app_document')
@@ -0,0 +1,74 @@
+"""document next_reminder_at
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Snapshot of the thresholds at the time of this migration; the application
+# keeps the columns up to date with the values from bot.config afterwards.
+REMINDER_CHANNELS = (
+    ('telegram', 'telegram_reminder_sent', 30),
+    ('sms', 'sms_reminder_sent', 21),
+    ('call', 'call_reminder_sent', 14),
+)
+
+# Partial indexes from 0001 used by the expiration-window scan, which
+# next_reminder_at replaces.
+WINDOW_INDEXES = tuple(f'ix_document_expiration_{channel}_pending' for channel, _, _ in REMINDER_CHANNELS)
+
+
+def upgrade() -> None:
+    op.add_column('evoicebot_app_document', sa.Column('next_reminder_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('evoicebot_app_document', sa.Column('next_reminder_channel', sa.String(length=16), nullable=True))
+
+    today = "(date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+    at_cases, channel_cases = [], []
+    for channel, flag, days in REMINDER_CHANNELS:
+        day = f"((date_trunc('day', expiration_date AT TIME ZONE 'UTC') - interval '{days} days') AT TIME ZONE 'UTC')"
+        condition = f"NOT {flag} AND {day} >= {today}"
+        at_cases.append(f"WHEN {condition} THEN {day}")
+        channel_cases.append(f"WHEN {condition} THEN '{channel}'")
+
+    op.execute(f"""
+        UPDATE evoicebot_app_document
+        SET next_reminder_at      = CASE {' '.join(at_cases)} END,
+            next_reminder_channel = CASE {' '.join(channel_cases)} END
+        WHERE expiration_date IS NOT NULL
+        """)
+
+    op.create_index(
+        'ix_document_next_reminder_at',
+        'evoicebot_app_document',
+        ['next_reminder_at', 'id'],
+        postgresql_where=sa.text('next_reminder_at IS NOT NULL'),
+    )
+
+    # No query reads the per-channel window indexes any more; they would only
+    # add a write to every reminder flag update.
+    for index in WINDOW_INDEXES:
+        op.drop_index(index, table_name='evoicebot_app_document')
+
+
+def downgrade() -> None:
+    for (channel, flag, _), index in zip(REMINDER_CHANNELS, WINDOW_INDEXES):
+        op.create_index(
+            index,
+            'evoicebot_app_document',
+            ['expiration_date'],
+            postgresql_where=sa.text(f'expiration_date IS NOT NULL AND NOT {flag}'),
+        )
+    op.drop_index('ix_document_next_reminder_at', table_name='evoicebot_app_document')
+    op.drop_column('evoicebot_app_document', 'next_reminder_channel')
+    op.drop_column('evoicebot_app_document', 'next_reminder_at')
@@ -0,0 +1,27 @@
+"""document reminder lease
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('evoicebot_app_document', sa.Column('reminder_lease_owner', sa.String(length=128), nullable=True))
+    op.add_column('evoicebot_app_document', sa.Column('reminder_lease_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('evoicebot_app_document', 'reminder_lease_until')
+    op.drop_column('evoicebot_app_document', 'reminder_lease_owner')
@@ -0,0 +1,70 @@
+"""reminder outbox
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'evoicebot_app_reminderoutbox',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('document_id', sa.Integer(),
+                  sa.ForeignKey('evoicebot_app_document.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('channel', sa.String(length=16), nullable=False),
+        sa.Column('payload', postgresql.JSONB(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('available_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_by', sa.String(length=128), nullable=True),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        'ix_reminderoutbox_pending',
+        'evoicebot_app_reminderoutbox',
+        ['available_at', 'id'],
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+    op.create_index(
+        'ix_reminderoutbox_processing',
+        'evoicebot_app_reminderoutbox',
+        ['locked_until'],
+        postgresql_where=sa.text("status = 'processing'"),
+    )
+    op.create_index('ix_reminderoutbox_document', 'evoicebot_app_reminderoutbox', ['document_id'])
+
+    op.create_table(
+        'evoicebot_app_reminderoutboxattempt',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('outbox_id', sa.BigInteger(),
+                  sa.ForeignKey('evoicebot_app_reminderoutbox.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('attempt', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.String(length=128), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('duration_ms', sa.Integer(), nullable=False),
+        sa.Column('succeeded', sa.Boolean(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+    )
+    op.create_index('ix_reminderoutboxattempt_outbox', 'evoicebot_app_reminderoutboxattempt', ['outbox_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('evoicebot_app_reminderoutboxattempt')
+    op.drop_table('evoicebot_app_reminderoutbox')
@@ -0,0 +1,39 @@
+"""reminder ledger
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'evoicebot_app_reminderledger',
+        sa.Column('id', sa.BigInteger(), primary_key=True),
+        sa.Column('document_id', sa.Integer(),
+                  sa.ForeignKey('evoicebot_app_document.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('channel', sa.String(length=16), nullable=False),
+        sa.Column('threshold_date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False, server_default='claimed'),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('provider_ref', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint('document_id', 'channel', 'threshold_date', name='uq_reminderledger_key'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('evoicebot_app_reminderledger')
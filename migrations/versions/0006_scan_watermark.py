@@ -0,0 +1,32 @@
+"""scan watermark
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'evoicebot_app_scanwatermark',
+        sa.Column('name', sa.String(length=64), primary_key=True),
+        sa.Column('value', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_document_updated_at', 'evoicebot_app_document', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_updated_at', table_name='evoicebot_app_document')
+    op.drop_table('evoicebot_app_scanwatermark')
@@ -0,0 +1,52 @@
+"""reminder catch-up windows
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Snapshot of the thresholds at the time of this migration; the application
+# keeps the columns up to date with the values from bot.config afterwards.
+REMINDER_CHANNELS = (
+    ('telegram', 'telegram_reminder_sent', 30),
+    ('sms', 'sms_reminder_sent', 21),
+    ('call', 'call_reminder_sent', 14),
+)
+
+
+def _backfill(missed_days_due):
+    today = "(date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+    expiration_day = "(date_trunc('day', expiration_date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+    at_cases, channel_cases = [], []
+    for channel, flag, days in REMINDER_CHANNELS:
+        day = f"((date_trunc('day', expiration_date AT TIME ZONE 'UTC') - interval '{days} days') AT TIME ZONE 'UTC')"
+        condition = f"NOT {flag} AND {expiration_day if missed_days_due else day} >= {today}"
+        at_cases.append(f"WHEN {condition} THEN {day}")
+        channel_cases.append(f"WHEN {condition} THEN '{channel}'")
+
+    op.execute(f"""
+        UPDATE evoicebot_app_document
+        SET next_reminder_at      = CASE {' '.join(at_cases)} END,
+            next_reminder_channel = CASE {' '.join(channel_cases)} END
+        WHERE expiration_date IS NOT NULL
+        """)
+
+
+def upgrade() -> None:
+    # Reminders whose threshold day was missed become due again until the
+    # document expires; the scheduler paces them as catch-up.
+    _backfill(missed_days_due=True)
+
+
+def downgrade() -> None:
+    _backfill(missed_days_due=False)
@@ -0,0 +1,37 @@
+"""reminder digest
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Digest rows cover several documents and carry them in the payload.
+    op.alter_column('evoicebot_app_reminderoutbox', 'document_id', nullable=True)
+    op.add_column('evoicebot_app_reminderoutbox', sa.Column('digest_key', sa.String(length=64), nullable=True))
+    op.create_index(
+        'uq_reminderoutbox_pending_digest',
+        'evoicebot_app_reminderoutbox',
+        ['digest_key'],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_reminderoutbox_pending_digest', table_name='evoicebot_app_reminderoutbox')
+    op.drop_column('evoicebot_app_reminderoutbox', 'digest_key')
+    op.execute("DELETE FROM evoicebot_app_reminderoutbox WHERE document_id IS NULL")
+    op.alter_column('evoicebot_app_reminderoutbox', 'document_id', nullable=False)
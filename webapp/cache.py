@@ -0,0 +1,74 @@
+import threading
+
+from cachetools import TTLCache
+
+from bot.config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+
+
+class ProfileCache:
+    """
+    Pamięć podręczna profili użytkowników (LRU + TTL) indeksowana po telegram_id i nazwie użytkownika.
+
+    Dostęp odbywa się z wątków wykonujących zapytania, dlatego operacje są chronione blokadą.
+    """
+
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL):
+        self._by_telegram_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._by_username = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, cache, key):
+        with self._lock:
+            profile = cache.get(key)
+            if profile is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return profile
+
+    def get_by_telegram_id(self, telegram_id):
+        return self._get(self._by_telegram_id, telegram_id)
+
+    def get_by_username(self, username):
+        return self._get(self._by_username, username)
+
+    def put(self, profile):
+        with self._lock:
+            if profile.telegram_id:
+                self._by_telegram_id[profile.telegram_id] = profile
+            if profile.username:
+                self._by_username[profile.username] = profile
+
+    def invalidate(self, profile=None, telegram_id=None, username=None):
+        telegram_ids = {telegram_id}
+        usernames = {username}
+        if profile is not None:
+            telegram_ids.add(profile.telegram_id)
+            usernames.add(profile.username)
+
+        with self._lock:
+            for key in telegram_ids - {None}:
+                self._by_telegram_id.pop(key, None)
+            for key in usernames - {None}:
+                self._by_username.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_telegram_id.clear()
+            self._by_username.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "by_telegram_id": len(self._by_telegram_id),
+                "by_username": len(self._by_username),
+            }
+
+
+profile_cache = ProfileCache()
@@ -1,20 +1,225 @@
+import logging
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
 
 import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
 
-from bot.config import PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD
+from bot.config import (PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE,
+                        DB_POOL_MAX_LIFETIME, DB_POOL_TIMEOUT, DB_POOL_HEALTH_CHECK_AFTER)
+
+logger = logging.getLogger(__name__)
 
 CONNECTION_STRING = f"host={PGHOST} port={PGPORT} dbname={PGDATABASE} user={PGUSER} password={PGPASSWORD}"
 
 
+class PoolTimeout(PoolError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Pula połączeń psycopg2 współdzielona przez wszystkie modele.
+
+    Połączenia są sprawdzane przy wydawaniu (zamknięte lub bezczynne zbyt długo są
+    weryfikowane zapytaniem SELECT 1), wymieniane po przekroczeniu max_lifetime,
+    a czas oczekiwania na wolne połączenie jest zbierany w statystykach.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, max_lifetime=1800, timeout=30, health_check_after=30):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created_at, returned_at)
+        self._created_at = {}
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+
+        for _ in range(self.min_size):
+            conn = self._connect()
+            self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self._opened += 1
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, created_at, now):
+        return self.max_lifetime and now - created_at >= self.max_lifetime
+
+    def _is_healthy(self, conn, created_at, returned_at):
+        now = time.monotonic()
+        if conn.closed or self._expired(created_at, now):
+            return False
+        if now - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Połączenie z puli nie przeszło sprawdzenia: {e}")
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Pula połączeń jest zamknięta")
+                    if self._idle:
+                        conn, created_at, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"Brak wolnego połączenia w puli po {self.timeout} s")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, created_at, returned_at):
+                with self._cond:
+                    self._discard(conn)
+                    self._size -= 1
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            created_at = self._created_at.get(id(conn), 0)
+            if discard or conn.closed or self._closed or self._expired(created_at, time.monotonic()):
+                self._discard(conn)
+                self._size -= 1
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "checkout_wait_avg_ms": (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "checkout_wait_max_ms": self._wait_max * 1000,
+                "timeouts": self._timeouts,
+                "opened": self._opened,
+                "discarded": self._discarded,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    CONNECTION_STRING,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    timeout=DB_POOL_TIMEOUT,
+                    health_check_after=DB_POOL_HEALTH_CHECK_AFTER
+                )
+                logger.info(f"Utworzono pulę połączeń z bazą danych (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+    return _pool
+
+
+def get_pool_stats():
+    return _pool.stats() if _pool is not None else None
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            logger.info(f"Zamykanie puli połączeń: {_pool.stats()}")
+            _pool.closeall()
+            _pool = None
+
+
 @contextmanager
 def get_db():
-    conn = psycopg2.connect(CONNECTION_STRING)
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        pool.putconn(conn, discard=broken or bool(conn.closed))
 
 
-def get_db_connection():
-    return psycopg2.connect(CONNECTION_STRING)
+def get_db_connection(**kwargs):
+    return psycopg2.connect(CONNECTION_STRING, **kwargs)
@@ -1,10 +1,78 @@
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
+import pytz
+from psycopg2.extras import execute_values, Json
+
+from bot.config import (TELEGRAM_REMINDER_DAYS, SMS_REMINDER_DAYS, CALL_REMINDER_DAYS, DB_STREAM_FETCH_SIZE,
+                        REMINDER_CLAIM_BATCH_SIZE, REMINDER_LEASE_SECONDS,
+                        REMINDER_INDEX_CHANNEL, SCAN_WATERMARK_OVERLAP)
+from webapp.cache import profile_cache
 from webapp.database import get_db
 
 
+# (channel, flag column, days before expiration) ordered from the earliest reminder.
+REMINDER_CHANNELS = tuple(sorted((
+    ('telegram', 'telegram_reminder_sent', TELEGRAM_REMINDER_DAYS),
+    ('sms', 'sms_reminder_sent', SMS_REMINDER_DAYS),
+    ('call', 'call_reminder_sent', CALL_REMINDER_DAYS),
+), key=lambda channel: -channel[2]))
+
+
+def _next_reminder_sql():
+    # Start (00:00 UTC) of the earliest threshold day whose reminder has not
+    # been sent yet, together with its channel. Missed days stay due (catch-up)
+    # until the document expires.
+    today = "(date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+    expiration_day = "(date_trunc('day', expiration_date AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+    at_cases, channel_cases = [], []
+    for channel, flag, days in REMINDER_CHANNELS:
+        day = f"((date_trunc('day', expiration_date AT TIME ZONE 'UTC') - interval '{days} days') AT TIME ZONE 'UTC')"
+        condition = f"NOT {flag} AND {expiration_day} >= {today}"
+        at_cases.append(f"WHEN {condition} THEN {day}")
+        channel_cases.append(f"WHEN {condition} THEN '{channel}'")
+    return (f"CASE WHEN expiration_date IS NULL THEN NULL {' '.join(at_cases)} END",
+            f"CASE WHEN expiration_date IS NULL THEN NULL {' '.join(channel_cases)} END")
+
+
+NEXT_REMINDER_AT_SQL, NEXT_REMINDER_CHANNEL_SQL = _next_reminder_sql()
+
+REFRESH_NEXT_REMINDER_SQL = f"""
+    UPDATE evoicebot_app_document
+    SET next_reminder_at      = {NEXT_REMINDER_AT_SQL},
+        next_reminder_channel = {NEXT_REMINDER_CHANNEL_SQL}
+    WHERE id = ANY(%s)
+    """
+
+# Like REFRESH_NEXT_REMINDER_SQL, but a reminder that is still pending is not
+# due again before the given time.
+DEFER_NEXT_REMINDER_SQL = f"""
+    UPDATE evoicebot_app_document
+    SET next_reminder_at      = CASE WHEN ({NEXT_REMINDER_AT_SQL}) IS NULL THEN NULL
+                                     ELSE GREATEST({NEXT_REMINDER_AT_SQL}, %s) END,
+        next_reminder_channel = {NEXT_REMINDER_CHANNEL_SQL}
+    WHERE id = ANY(%s)
+    """
+
+
+def _stream_rows(cursor_name, query, params, fetch_size, build):
+    # Named (server-side) cursor: rows are transferred fetch_size at a time
+    # and handed out as chunks, so memory stays bounded by the chunk size.
+    with get_db() as conn:
+        with conn.cursor(name=cursor_name) as cur:
+            cur.itersize = fetch_size
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield [build(row) for row in rows]
+
+
 class UserProfile:
+    __slots__ = ('id', 'phone', 'description', 'role', 'created_at', 'updated_at', 'user_id',
+                 'telegram_id', 'username', 'first_name', 'last_name', 'email')
+
     def __init__(self, id=None, phone=None, description=None, role='member',
                  created_at=None, updated_at=None, user_id=None, telegram_id=None,
                  username=None, first_name=None, last_name=None, email=None):
@@ -23,6 +91,10 @@ class UserProfile:
 
     @classmethod
     def get_by_telegram_id(cls, telegram_id: int):
+        cached = profile_cache.get_by_telegram_id(telegram_id)
+        if cached is not None:
+            return cached
+
         with get_db() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -44,11 +116,17 @@ class UserProfile:
                             """, (telegram_id,))
                 row = cur.fetchone()
                 if row:
-                    return cls(*row)
+                    profile = cls(*row)
+                    profile_cache.put(profile)
+                    return profile
                 return None
 
     @classmethod
     def get_by_username(cls, username: str):
+        cached = profile_cache.get_by_username(username)
+        if cached is not None:
+            return cached
+
         with get_db() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -70,7 +148,9 @@ class UserProfile:
                             """, (username,))
                 row = cur.fetchone()
                 if row:
-                    return cls(*row)
+                    profile = cls(*row)
+                    profile_cache.put(profile)
+                    return profile
                 return None
 
     def update_telegram_id(self, telegram_id: int):
@@ -83,65 +163,60 @@ class UserProfile:
                             WHERE id = %s
                             """, (telegram_id, datetime.now(), self.id))
                 conn.commit()
+                profile_cache.invalidate(self, telegram_id=telegram_id)
                 self.telegram_id = telegram_id
 
     @classmethod
     def create(cls, telegram_id: int, first_name: str, last_name: str = None,
                username: str = None, phone: str = None):
+        target_username = username or f"tg_{telegram_id}"
+        now = datetime.now()
+
+        # auth_user and the profile are upserted in one statement; the final
+        # SELECT returns the same columns as get_by_id, so no re-read is needed.
         with get_db() as conn:
             with conn.cursor() as cur:
-                # Check if user with this username already exists
-                user_id = None
-                target_username = username or f"tg_{telegram_id}"
-
-                cur.execute("SELECT id FROM auth_user WHERE username = %s", (target_username,))
-                existing_user = cur.fetchone()
-
-                if existing_user:
-                    user_id = existing_user[0]
-                    # Update existing user's info
-                    cur.execute("""
-                                UPDATE auth_user
-                                SET first_name = %s,
-                                    last_name  = %s
-                                WHERE id = %s
-                                """, (first_name, last_name or '', user_id))
-                else:
-                    # Create new auth_user
-                    cur.execute("""
+                cur.execute("""
+                            WITH account AS (
                                 INSERT INTO auth_user
-                                (username, first_name, last_name, email, is_staff, is_active, is_superuser,
-                                 date_joined, password, last_login)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-                                """, (target_username, first_name, last_name or '',
-                                      '', False, True, False, datetime.now(), '', None))
-                    user_id = cur.fetchone()[0]
-
-                # Check if profile already exists for this user
-                cur.execute("SELECT id FROM evoicebot_app_userprofile WHERE user_id = %s", (user_id,))
-                existing_profile = cur.fetchone()
-
-                if existing_profile:
-                    # Update existing profile with telegram_id and phone
-                    cur.execute("""
-                                UPDATE evoicebot_app_userprofile
-                                SET telegram_id = %s,
-                                    phone       = %s,
-                                    updated_at  = %s
-                                WHERE user_id = %s RETURNING id
-                                """, (telegram_id, phone, datetime.now(), user_id))
-                    profile_id = cur.fetchone()[0]
-                else:
-                    # Create new profile
-                    cur.execute("""
-                                INSERT INTO evoicebot_app_userprofile
-                                    (phone, role, created_at, updated_at, user_id, telegram_id)
-                                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
-                                """, (phone, 'member', datetime.now(), datetime.now(), user_id, telegram_id))
-                    profile_id = cur.fetchone()[0]
-
+                                    (username, first_name, last_name, email, is_staff, is_active, is_superuser,
+                                     date_joined, password, last_login)
+                                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                                    ON CONFLICT (username) DO UPDATE
+                                        SET first_name = EXCLUDED.first_name,
+                                            last_name  = EXCLUDED.last_name
+                                    RETURNING id, username, first_name, last_name, email),
+                                 profile AS (
+                                     INSERT INTO evoicebot_app_userprofile
+                                         (phone, role, created_at, updated_at, user_id, telegram_id)
+                                         SELECT %s, %s, %s, %s, account.id, %s
+                                         FROM account
+                                         ON CONFLICT (user_id) DO UPDATE
+                                             SET telegram_id = EXCLUDED.telegram_id,
+                                                 phone       = EXCLUDED.phone,
+                                                 updated_at  = EXCLUDED.updated_at
+                                         RETURNING id, phone, description, role, created_at, updated_at, user_id,
+                                             telegram_id)
+                            SELECT profile.id,
+                                   profile.phone,
+                                   profile.description,
+                                   profile.role,
+                                   profile.created_at,
+                                   profile.updated_at,
+                                   profile.user_id,
+                                   profile.telegram_id,
+                                   account.username,
+                                   account.first_name,
+                                   account.last_name,
+                                   account.email
+                            FROM profile
+                                     JOIN account ON profile.user_id = account.id
+                            """, (target_username, first_name, last_name or '', '', False, True, False, now, '', None,
+                                  phone, 'member', now, now, telegram_id))
+                row = cur.fetchone()
                 conn.commit()
-                return cls.get_by_id(profile_id)
+                profile_cache.invalidate(telegram_id=telegram_id, username=target_username)
+                return cls(*row)
 
     @classmethod
     def get_by_id(cls, profile_id: int):
@@ -179,10 +254,26 @@ class UserProfile:
                             WHERE id = %s
                             """, (phone, datetime.now(), self.id))
                 conn.commit()
+                profile_cache.invalidate(self)
                 self.phone = phone
 
 
 class Document:
+    COLUMNS = ('id', 'uuid', 'title', 'description', 'file', 'file_type', 'created_at', 'updated_at',
+               'deadline', 'project_id', 'team_id', 'ai_description', 'ai_audio', 'file_id', 'mime_type',
+               'size', 'user_profile_id', 'expiration_date', 'telegram_reminder_sent', 'sms_reminder_sent',
+               'call_reminder_sent', 'call_attempts', 'call_message_listened', 'last_call_date',
+               'gcs_file_path', 'gcs_uploaded', 'next_reminder_at', 'next_reminder_channel')
+    # Projections for list views and reminder scans; heavy text columns
+    # (description, ai_description, ai_audio) are left out.
+    LIST_COLUMNS = ('id', 'title', 'created_at', 'expiration_date', 'gcs_file_path', 'gcs_uploaded')
+    REPORT_COLUMNS = ('id', 'title', 'expiration_date', 'mime_type', 'size')
+    REMINDER_COLUMNS = ('id', 'title', 'user_profile_id', 'expiration_date', 'telegram_reminder_sent',
+                        'sms_reminder_sent', 'call_reminder_sent', 'call_attempts', 'call_message_listened',
+                        'last_call_date', 'next_reminder_at', 'next_reminder_channel')
+
+    __slots__ = COLUMNS + ('owner',)
+
     def __init__(self, id=None, uuid=None, title=None, description=None, file=None,
                  file_type=None, created_at=None, updated_at=None, deadline=None,
                  project_id=None, team_id=None, ai_description=None, ai_audio=None,
@@ -190,7 +281,7 @@ class Document:
                  expiration_date=None, telegram_reminder_sent=False,
                  sms_reminder_sent=False, call_reminder_sent=False,
                  call_attempts=0, call_message_listened=False, last_call_date=None,
-                 gcs_file_path=None, gcs_uploaded=False):
+                 gcs_file_path=None, gcs_uploaded=False, next_reminder_at=None, next_reminder_channel=None):
         self.id = id
         self.uuid = uuid
         self.title = title
@@ -208,7 +299,6 @@ class Document:
         self.mime_type = mime_type
         self.size = size
         self.user_profile_id = user_profile_id
-        self.user_id = user_profile_id  # Alias for compatibility
         self.expiration_date = expiration_date
         self.telegram_reminder_sent = telegram_reminder_sent
         self.sms_reminder_sent = sms_reminder_sent
@@ -218,7 +308,33 @@ class Document:
         self.last_call_date = last_call_date
         self.gcs_file_path = gcs_file_path
         self.gcs_uploaded = gcs_uploaded
-        self.name = title  # Alias for compatibility
+        self.next_reminder_at = next_reminder_at
+        self.next_reminder_channel = next_reminder_channel
+        self.owner = None
+
+    @property
+    def user_id(self):
+        # Alias for compatibility
+        return self.user_profile_id
+
+    @property
+    def name(self):
+        # Alias for compatibility
+        return self.title
+
+    @classmethod
+    def _select_list(cls, columns, alias=None):
+        unknown = set(columns) - set(cls.COLUMNS)
+        if unknown:
+            raise ValueError(f"Nieznane kolumny dokumentu: {sorted(unknown)}")
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(prefix + column for column in columns)
+
+    @classmethod
+    def _from_row(cls, row, columns=COLUMNS):
+        if columns == cls.COLUMNS:
+            return cls(*row)
+        return cls(**dict(zip(columns, row)))
 
     @classmethod
     def create(cls, user_id: int, file_id: str, title: str, mime_type: str = None,
@@ -226,18 +342,19 @@ class Document:
         with get_db() as conn:
             with conn.cursor() as cur:
                 doc_uuid = str(uuid.uuid4())
-                cur.execute("""
+                cur.execute(f"""
                             INSERT INTO evoicebot_app_document
                             (uuid, title, file, file_type, created_at, updated_at,
                              file_id, mime_type, size, user_profile_id, telegram_reminder_sent,
                              sms_reminder_sent, call_reminder_sent, call_attempts,
                              call_message_listened, gcs_uploaded)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                            RETURNING {cls._select_list(cls.COLUMNS)}
                             """, (doc_uuid, title, '', 'pdf', datetime.now(), datetime.now(),
                                   file_id, mime_type, size, user_id, False, False, False, 0, False, False))
-                doc_id = cur.fetchone()[0]
+                row = cur.fetchone()
                 conn.commit()
-                return cls.get_by_id(doc_id)
+                return cls(*row)
 
     @classmethod
     def get_by_id(cls, doc_id: int):
@@ -268,31 +385,17 @@ class Document:
                 return None
 
     @classmethod
-    def get_by_user_id(cls, user_id: int):
+    def get_by_user_id(cls, user_id: int, columns=COLUMNS):
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                            SELECT id,
-                                   uuid,
-                                   title,
-                                   description,
-                                   file,
-                                   file_type,
-                                   created_at,
-                                   updated_at,
-                                   deadline,
-                                   project_id,
-                                   team_id,
-                                   ai_description,
-                                   ai_audio,
-                                   file_id,
-                                   mime_type, size, user_profile_id, expiration_date, telegram_reminder_sent, sms_reminder_sent, call_reminder_sent, call_attempts, call_message_listened, last_call_date, gcs_file_path, gcs_uploaded
+                cur.execute(f"""
+                            SELECT {cls._select_list(columns)}
                             FROM evoicebot_app_document
                             WHERE user_profile_id = %s
                             ORDER BY created_at DESC
                             """, (user_id,))
                 rows = cur.fetchall()
-                return [cls(*row) for row in rows]
+                return [cls._from_row(row, columns) for row in rows]
 
     @classmethod
     def get_expiring_documents(cls):
@@ -320,6 +423,188 @@ class Document:
                 rows = cur.fetchall()
                 return [cls(*row) for row in rows]
 
+    @classmethod
+    def claim_due_documents(cls, worker_id: str, as_of: datetime = None, limit: int = REMINDER_CLAIM_BATCH_SIZE,
+                            lease_seconds: int = REMINDER_LEASE_SECONDS, columns=REMINDER_COLUMNS):
+        # Leases a batch of due documents for this worker. Rows locked by a
+        # concurrent claim are skipped and rows leased by another worker stay
+        # invisible until the lease expires, so replicas never share a document.
+        query = f"""
+                WITH claimed AS (
+                    SELECT id
+                    FROM evoicebot_app_document
+                    WHERE next_reminder_at <= %s
+                      AND (reminder_lease_until IS NULL OR reminder_lease_until < now())
+                    ORDER BY next_reminder_at, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ), leased AS (
+                    UPDATE evoicebot_app_document d
+                    SET reminder_lease_owner = %s,
+                        reminder_lease_until = now() + %s * interval '1 second'
+                    FROM claimed
+                    WHERE d.id = claimed.id
+                    RETURNING d.*
+                )
+                SELECT {cls._select_list(columns, 'd')},
+                       up.id,
+                       up.telegram_id,
+                       up.phone,
+                       u.first_name,
+                       u.last_name
+                FROM leased d
+                         LEFT JOIN evoicebot_app_userprofile up ON d.user_profile_id = up.id
+                         LEFT JOIN auth_user u ON up.user_id = u.id
+                ORDER BY d.next_reminder_at, d.id
+                """
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (as_of or datetime.now(pytz.UTC), limit, worker_id, lease_seconds))
+                rows = cur.fetchall()
+                conn.commit()
+                return [cls._with_owner(row, columns) for row in rows]
+
+    @staticmethod
+    def release_leases(document_ids, worker_id: str):
+        if not document_ids:
+            return
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            UPDATE evoicebot_app_document
+                            SET reminder_lease_owner = NULL,
+                                reminder_lease_until = NULL
+                            WHERE id = ANY(%s)
+                              AND reminder_lease_owner = %s
+                            """, (list(document_ids), worker_id))
+                conn.commit()
+
+    @classmethod
+    def iter_by_user_id(cls, user_id: int, fetch_size: int = DB_STREAM_FETCH_SIZE, columns=COLUMNS):
+        query = f"""
+                SELECT {cls._select_list(columns)}
+                FROM evoicebot_app_document
+                WHERE user_profile_id = %s
+                ORDER BY created_at DESC
+                """
+        yield from _stream_rows("user_documents", query, (user_id,), fetch_size,
+                                lambda row: cls._from_row(row, columns))
+
+    @staticmethod
+    def get_next_reminders(document_ids):
+        if not document_ids:
+            return []
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            SELECT id, next_reminder_at, next_reminder_channel
+                            FROM evoicebot_app_document
+                            WHERE id = ANY(%s)
+                            """, (list(document_ids),))
+                return cur.fetchall()
+
+    @staticmethod
+    def notify_reminder_changed(document_ids):
+        # Lets the scheduler leader (which LISTENs on this channel) pick up
+        # documents whose reminders were changed by another process.
+        if not document_ids:
+            return
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)",
+                            (REMINDER_INDEX_CHANNEL, ",".join(str(document_id) for document_id in document_ids)))
+                conn.commit()
+
+    @staticmethod
+    def iter_next_reminders(until: datetime, after: datetime = None, fetch_size: int = DB_STREAM_FETCH_SIZE):
+        # (id, next_reminder_at, next_reminder_channel) for reminders due in
+        # [after, until); without ``after`` overdue reminders are included.
+        query = """
+                SELECT id, next_reminder_at, next_reminder_channel
+                FROM evoicebot_app_document
+                WHERE next_reminder_at < %s
+                  AND (%s::timestamptz IS NULL OR next_reminder_at >= %s)
+                ORDER BY next_reminder_at, id
+                """
+        yield from _stream_rows("next_reminders", query, (until, after, after), fetch_size, tuple)
+
+    @staticmethod
+    def iter_forecast_rows(until: datetime, title: str = None, fetch_size: int = DB_STREAM_FETCH_SIZE):
+        # Bulk read for capacity forecasts, in TriageBatch column order:
+        # expiration, reachable (owner has a phone), the three reminder flags,
+        # call attempts, call listened and last call (epoch seconds), for
+        # documents not yet expired.
+        query = """
+                SELECT extract(epoch FROM d.expiration_date),
+                       COALESCE(up.phone, '') <> '',
+                       COALESCE(d.telegram_reminder_sent, FALSE),
+                       COALESCE(d.sms_reminder_sent, FALSE),
+                       COALESCE(d.call_reminder_sent, FALSE),
+                       COALESCE(d.call_attempts, 0),
+                       COALESCE(d.call_message_listened, FALSE),
+                       extract(epoch FROM d.last_call_date)
+                FROM evoicebot_app_document d
+                         LEFT JOIN evoicebot_app_userprofile up ON d.user_profile_id = up.id
+                WHERE d.expiration_date >= date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+                  AND d.expiration_date < %s
+                  AND (%s::text IS NULL OR d.title ILIKE %s)
+                """
+        pattern = f"%{title}%" if title else None
+        yield from _stream_rows("forecast_documents", query, (until, title, pattern), fetch_size, tuple)
+
+    @classmethod
+    def _with_owner(cls, row, columns=COLUMNS):
+        document = cls._from_row(row[:len(columns)], columns)
+        profile_id, telegram_id, phone, first_name, last_name = row[len(columns):]
+        document.owner = UserProfile(id=profile_id, telegram_id=telegram_id, phone=phone,
+                                     first_name=first_name, last_name=last_name) if profile_id else None
+        return document
+
+    @staticmethod
+    def defer_next_reminders(document_ids, not_before: datetime):
+        if not document_ids:
+            return
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(DEFER_NEXT_REMINDER_SQL, (not_before, list(document_ids)))
+                conn.commit()
+
+    @staticmethod
+    def refresh_changed_documents(watermark: str = 'reminder_scan', overlap_seconds: int = SCAN_WATERMARK_OVERLAP):
+        # Recomputes next_reminder_at only for documents modified since the
+        # stored watermark (e.g. by the web app) and advances it. Threshold
+        # crossings need no scan: they are already in next_reminder_at.
+        # The first run has no watermark and refreshes every document once.
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            SELECT value
+                            FROM evoicebot_app_scanwatermark
+                            WHERE name = %s
+                                FOR UPDATE
+                            """, (watermark,))
+                row = cur.fetchone()
+                since = row[0] if row else None
+                cur.execute("SELECT now()")
+                until = cur.fetchone()[0]
+                cur.execute(f"""
+                            UPDATE evoicebot_app_document
+                            SET next_reminder_at      = {NEXT_REMINDER_AT_SQL},
+                                next_reminder_channel = {NEXT_REMINDER_CHANNEL_SQL}
+                            WHERE updated_at <= %s
+                              AND (%s::timestamptz IS NULL OR updated_at > %s::timestamptz - %s * interval '1 second')
+                            RETURNING id, next_reminder_at, next_reminder_channel
+                            """, (until, since, since, overlap_seconds))
+                changed = cur.fetchall()
+                cur.execute("""
+                            INSERT INTO evoicebot_app_scanwatermark (name, value, updated_at)
+                            VALUES (%s, %s, now())
+                            ON CONFLICT (name) DO UPDATE SET value      = EXCLUDED.value,
+                                                             updated_at = EXCLUDED.updated_at
+                            """, (watermark, until))
+                conn.commit()
+                return changed
+
     def update_expiration_date(self, expiration_date: datetime):
         with get_db() as conn:
             with conn.cursor() as cur:
@@ -329,6 +614,7 @@ class Document:
                                 updated_at      = %s
                             WHERE id = %s
                             """, (expiration_date, datetime.now(), self.id))
+                cur.execute(REFRESH_NEXT_REMINDER_SQL, ([self.id],))
                 conn.commit()
                 self.expiration_date = expiration_date
 
@@ -341,6 +627,7 @@ class Document:
                                 updated_at             = %s
                             WHERE id = %s
                             """, (sent, datetime.now(), self.id))
+                cur.execute(REFRESH_NEXT_REMINDER_SQL, ([self.id],))
                 conn.commit()
                 self.telegram_reminder_sent = sent
 
@@ -353,6 +640,7 @@ class Document:
                                 updated_at        = %s
                             WHERE id = %s
                             """, (sent, datetime.now(), self.id))
+                cur.execute(REFRESH_NEXT_REMINDER_SQL, ([self.id],))
                 conn.commit()
                 self.sms_reminder_sent = sent
 
@@ -365,6 +653,7 @@ class Document:
                                 updated_at         = %s
                             WHERE id = %s
                             """, (sent, datetime.now(), self.id))
+                cur.execute(REFRESH_NEXT_REMINDER_SQL, ([self.id],))
                 conn.commit()
                 self.call_reminder_sent = sent
 
@@ -394,6 +683,33 @@ class Document:
                 conn.commit()
                 self.call_message_listened = listened
 
+    @staticmethod
+    def bulk_update_reminder_state(rows):
+        # rows: (id, telegram_reminder_sent, sms_reminder_sent, call_reminder_sent,
+        #        call_message_listened, call_attempts_delta, last_call_date, updated_at);
+        # NULL means "leave unchanged".
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                                    UPDATE evoicebot_app_document AS d
+                                    SET telegram_reminder_sent = COALESCE(v.telegram_reminder_sent, d.telegram_reminder_sent),
+                                        sms_reminder_sent      = COALESCE(v.sms_reminder_sent, d.sms_reminder_sent),
+                                        call_reminder_sent     = COALESCE(v.call_reminder_sent, d.call_reminder_sent),
+                                        call_message_listened  = COALESCE(v.call_message_listened, d.call_message_listened),
+                                        call_attempts          = d.call_attempts + v.call_attempts_delta,
+                                        last_call_date         = COALESCE(v.last_call_date, d.last_call_date),
+                                        updated_at             = v.updated_at
+                                    FROM (VALUES %s) AS v (id, telegram_reminder_sent, sms_reminder_sent,
+                                                           call_reminder_sent, call_message_listened,
+                                                           call_attempts_delta, last_call_date, updated_at)
+                                    WHERE d.id = v.id
+                                    """, rows,
+                               template="(%s::bigint, %s::boolean, %s::boolean, %s::boolean, %s::boolean, "
+                                        "%s::integer, %s::timestamptz, %s::timestamptz)",
+                               page_size=max(len(rows), 1))
+                cur.execute(REFRESH_NEXT_REMINDER_SQL, ([row[0] for row in rows],))
+                conn.commit()
+
     def update_gcs_path(self, gcs_path: str):
         with get_db() as conn:
             with conn.cursor() as cur:
@@ -410,6 +726,10 @@ class Document:
 
 
 class VoiceCall:
+    __slots__ = ('id', 'sid', 'to_number', 'from_number', 'message_text', 'status', 'duration', 'cost',
+                 'created_at', 'updated_at', 'answered_at', 'ended_at', 'document_id', 'user_profile_id',
+                 'confirmation_received')
+
     def __init__(self, id=None, sid=None, to_number=None, from_number=None,
                  message_text=None, status='initiated', duration=None, cost=None,
                  created_at=None, updated_at=None, answered_at=None, ended_at=None,
@@ -439,12 +759,15 @@ class VoiceCall:
                             INSERT INTO evoicebot_app_voicecall
                             (sid, to_number, from_number, message_text, status, created_at,
                              updated_at, document_id, user_profile_id, confirmation_received)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                            RETURNING id, sid, to_number, from_number, message_text, status, duration, cost,
+                                created_at, updated_at, answered_at, ended_at, document_id, user_profile_id,
+                                confirmation_received
                             """, (sid, to_number, from_number, message_text, 'initiated',
                                   datetime.now(), datetime.now(), document_id, user_profile_id, False))
-                call_id = cur.fetchone()[0]
+                row = cur.fetchone()
                 conn.commit()
-                return cls.get_by_id(call_id)
+                return cls(*row)
 
     @classmethod
     def get_by_id(cls, call_id: int):
@@ -487,4 +810,334 @@ class VoiceCall:
                 self.status = status
 
 
+class ReminderLedger:
+    """
+    Rejestr idempotencji przypomnień: jeden wiersz na (dokument, kanał, dzień progu).
+
+    Wiersz jest zakładany w tej samej transakcji co wpis w outboxie, zanim powstanie treść
+    wiadomości. Wygenerowana treść jest zapisywana, aby ponowienia nie odpytywały ponownie
+    LLM, a status "sent" blokuje drugą wysyłkę tego samego przypomnienia. Status "dead"
+    oznacza przypomnienie porzucone przez outbox, które kolejny przebieg może zająć ponownie.
+    """
+
+    CLAIMED, SENT, DEAD = 'claimed', 'sent', 'dead'
+
+    __slots__ = ('id', 'document_id', 'channel', 'threshold_date', 'status', 'message', 'provider_ref',
+                 'created_at', 'updated_at', 'sent_at')
+
+    def __init__(self, id=None, document_id=None, channel=None, threshold_date=None, status=CLAIMED,
+                 message=None, provider_ref=None, created_at=None, updated_at=None, sent_at=None):
+        self.id = id
+        self.document_id = document_id
+        self.channel = channel
+        self.threshold_date = threshold_date
+        self.status = status
+        self.message = message
+        self.provider_ref = provider_ref
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.sent_at = sent_at
+
+    @classmethod
+    def get_by_id(cls, ledger_id: int):
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            SELECT id,
+                                   document_id,
+                                   channel,
+                                   threshold_date,
+                                   status,
+                                   message,
+                                   provider_ref,
+                                   created_at,
+                                   updated_at,
+                                   sent_at
+                            FROM evoicebot_app_reminderledger
+                            WHERE id = %s
+                            """, (ledger_id,))
+                row = cur.fetchone()
+                if row:
+                    return cls(*row)
+                return None
+
+    def save_message(self, message: str):
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            UPDATE evoicebot_app_reminderledger
+                            SET message    = %s,
+                                updated_at = %s
+                            WHERE id = %s
+                            """, (message, datetime.now(pytz.UTC), self.id))
+                conn.commit()
+                self.message = message
+
+    def mark_sent(self, provider_ref: str = None):
+        now = datetime.now(pytz.UTC)
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                            UPDATE evoicebot_app_reminderledger
+                            SET status       = %s,
+                                provider_ref = %s,
+                                sent_at      = %s,
+                                updated_at   = %s
+                            WHERE id = %s
+                            """, (self.SENT, provider_ref, now, now, self.id))
+                conn.commit()
+                self.status = self.SENT
+                self.provider_ref = provider_ref
+                self.sent_at = now
+
+
+class ReminderOutbox:
+    COLUMNS = ('id', 'document_id', 'channel', 'payload', 'status', 'attempts', 'available_at', 'locked_by',
+               'locked_until', 'last_error', 'created_at', 'updated_at', 'sent_at', 'digest_key')
+    PENDING, PROCESSING, SENT, DEAD = 'pending', 'processing', 'sent', 'dead'
+    FLAGS = {channel: flag for channel, flag, _ in REMINDER_CHANNELS}
+
+    __slots__ = COLUMNS
+
+    def __init__(self, id=None, document_id=None, channel=None, payload=None, status=PENDING, attempts=0,
+                 available_at=None, locked_by=None, locked_until=None, last_error=None, created_at=None,
+                 updated_at=None, sent_at=None, digest_key=None):
+        self.id = id
+        self.document_id = document_id
+        self.channel = channel
+        self.payload = payload
+        self.status = status
+        self.attempts = attempts
+        self.available_at = available_at
+        self.locked_by = locked_by
+        self.locked_until = locked_until
+        self.last_error = last_error
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.sent_at = sent_at
+        self.digest_key = digest_key
+
+    @classmethod
+    def enqueue(cls, entries, digest: bool = False):
+        # Outbox rows and the reminder flags they stand for are written in one
+        # transaction, so a reminder is either queued and marked, or neither.
+        # Each entry first claims its (document, channel, threshold) ledger
+        # row; entries that were already claimed are not queued again, unless
+        # their earlier outbox row was dead-lettered.
+        # Entries are (document_id, channel, threshold_date, payload, available_at).
+        # In digest mode reminders are grouped into one row per user, channel
+        # and delivery day; a later reminder joins the group while it is pending.
+        if not entries:
+            return 0
+        now = datetime.now(pytz.UTC)
+        document_ids = list({document_id for document_id, _, _, _, _ in entries})
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                claimed = execute_values(cur, """
+                                         INSERT INTO evoicebot_app_reminderledger
+                                         (document_id, channel, threshold_date, status, created_at, updated_at)
+                                         VALUES %s
+                                         ON CONFLICT (document_id, channel, threshold_date) DO UPDATE
+                                             SET status     = EXCLUDED.status,
+                                                 updated_at = EXCLUDED.updated_at
+                                             WHERE evoicebot_app_reminderledger.status = 'dead'
+                                         RETURNING id, document_id, channel
+                                         """, [(document_id, channel, threshold_date, ReminderLedger.CLAIMED, now, now)
+                                               for document_id, channel, threshold_date, _, _ in entries], fetch=True)
+                ledger_ids = {(document_id, channel): ledger_id for ledger_id, document_id, channel in claimed}
+                queued = [(document_id, channel, dict(payload, ledger_id=ledger_ids[document_id, channel]),
+                           available_at or now)
+                          for document_id, channel, _, payload, available_at in entries
+                          if (document_id, channel) in ledger_ids]
+                if queued and digest:
+                    cls._enqueue_digests(cur, queued, now)
+                elif queued:
+                    execute_values(cur, """
+                                   INSERT INTO evoicebot_app_reminderoutbox
+                                   (document_id, channel, payload, status, attempts, available_at, created_at, updated_at)
+                                   VALUES %s
+                                   """, [(document_id, channel, Json(payload), cls.PENDING, 0, available_at, now, now)
+                                         for document_id, channel, payload, available_at in queued])
+                for channel, flag in cls.FLAGS.items():
+                    ids = [document_id for document_id, entry_channel, _, _, _ in entries if entry_channel == channel]
+                    if ids:
+                        cur.execute(f"""
+                                    UPDATE evoicebot_app_document
+                                    SET {flag}     = TRUE,
+                                        updated_at = %s
+                                    WHERE id = ANY(%s)
+                                    """, (now, ids))
+                cur.execute(REFRESH_NEXT_REMINDER_SQL, (document_ids,))
+                conn.commit()
+                return len(queued)
+
+    @classmethod
+    def _enqueue_digests(cls, cur, queued, now):
+        groups = {}
+        for document_id, channel, payload, available_at in queued:
+            key = f"{payload['user_id']}:{channel}:{available_at.date().isoformat()}"
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    'channel': channel,
+                    'available_at': available_at,
+                    'payload': {'user_id': payload['user_id'], 'telegram_id': payload['telegram_id'],
+                                'phone': payload['phone'], 'documents': []},
+                }
+            group['available_at'] = min(group['available_at'], available_at)
+            group['payload']['documents'].append({
+                'document_id': document_id,
+                'title': payload['title'],
+                'expiration_date': payload['expiration_date'],
+                'ledger_id': payload['ledger_id'],
+            })
+
+        execute_values(cur, """
+                       INSERT INTO evoicebot_app_reminderoutbox
+                       (document_id, channel, payload, status, attempts, available_at, created_at, updated_at,
+                        digest_key)
+                       VALUES %s
+                       ON CONFLICT (digest_key) WHERE status = 'pending' DO UPDATE
+                           SET payload      = jsonb_set(evoicebot_app_reminderoutbox.payload, '{documents}',
+                                                        (evoicebot_app_reminderoutbox.payload -> 'documents')
+                                                            || (EXCLUDED.payload -> 'documents')),
+                               available_at = LEAST(evoicebot_app_reminderoutbox.available_at, EXCLUDED.available_at),
+                               updated_at   = EXCLUDED.updated_at
+                       """, [(None, group['channel'], Json(group['payload']), cls.PENDING, 0, group['available_at'],
+                             now, now, key)
+                            for key, group in groups.items()])
+
+    @classmethod
+    def claim(cls, worker_id: str, limit: int, lease_seconds: int = REMINDER_LEASE_SECONDS):
+        # Pending rows that are due, plus rows whose worker died mid-delivery.
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                            WITH claimed AS (
+                                SELECT id
+                                FROM evoicebot_app_reminderoutbox
+                                WHERE (status = %s AND available_at <= now())
+                                   OR (status = %s AND locked_until < now())
+                                ORDER BY available_at, id
+                                LIMIT %s
+                                FOR UPDATE SKIP LOCKED
+                            )
+                            UPDATE evoicebot_app_reminderoutbox o
+                            SET status       = %s,
+                                attempts     = o.attempts + 1,
+                                locked_by    = %s,
+                                locked_until = now() + %s * interval '1 second',
+                                updated_at   = now()
+                            FROM claimed
+                            WHERE o.id = claimed.id
+                            RETURNING {", ".join("o." + column for column in cls.COLUMNS)}
+                            """, (cls.PENDING, cls.PROCESSING, limit, cls.PROCESSING, worker_id, lease_seconds))
+                rows = cur.fetchall()
+                conn.commit()
+                return [cls(*row) for row in rows]
+
+    def mark_sent(self, started_at: datetime, duration_ms: int):
+        self._finish(self.SENT, None, None, started_at, duration_ms)
+
+    def mark_failed(self, error: str, started_at: datetime, duration_ms: int, retry_at: datetime = None):
+        # Without retry_at the row is dead-lettered and left for inspection.
+        self._finish(self.PENDING if retry_at else self.DEAD, error, retry_at, started_at, duration_ms)
+
+    def _finish(self, status, error, retry_at, started_at, duration_ms):
+        now = datetime.now(pytz.UTC)
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                if status == self.PENDING and self.digest_key:
+                    retry_at = self._absorb_pending_digest(cur, retry_at)
+                if status == self.DEAD:
+                    self._release_dead(cur, now)
+                cur.execute("""
+                            UPDATE evoicebot_app_reminderoutbox
+                            SET status       = %s,
+                                last_error   = %s,
+                                available_at = COALESCE(%s, available_at),
+                                locked_by    = NULL,
+                                locked_until = NULL,
+                                sent_at      = %s,
+                                updated_at   = %s
+                            WHERE id = %s
+                            """, (status, error, retry_at, now if status == self.SENT else None, now, self.id))
+                cur.execute("""
+                            INSERT INTO evoicebot_app_reminderoutboxattempt
+                            (outbox_id, attempt, worker_id, started_at, duration_ms, succeeded, error)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            """, (self.id, self.attempts, self.locked_by, started_at, duration_ms,
+                                  status == self.SENT, error))
+                conn.commit()
+        self.status = status
+        self.last_error = error
+        self.locked_by = self.locked_until = None
+
+    def _release_dead(self, cur, now):
+        # A dead-lettered reminder was never sent: its ledger rows go to "dead"
+        # and the channel flag is cleared, so the next day's pass (or an
+        # operator) can queue it again instead of it being silently lost.
+        documents = self.payload.get('documents') or [
+            {'document_id': self.document_id, 'ledger_id': self.payload.get('ledger_id')}
+        ]
+        ledger_ids = [document['ledger_id'] for document in documents if document.get('ledger_id')]
+        document_ids = [document['document_id'] for document in documents]
+        if ledger_ids:
+            cur.execute("""
+                        UPDATE evoicebot_app_reminderledger
+                        SET status     = %s,
+                            updated_at = %s
+                        WHERE id = ANY(%s)
+                          AND status <> %s
+                        RETURNING document_id
+                        """, (ReminderLedger.DEAD, now, ledger_ids, ReminderLedger.SENT))
+            # Documents whose reminder did get through keep their flag.
+            released = {row[0] for row in cur.fetchall()}
+            document_ids = [document['document_id'] for document in documents
+                            if not document.get('ledger_id') or document['document_id'] in released]
+        if not document_ids:
+            return
+        cur.execute(f"""
+                    UPDATE evoicebot_app_document
+                    SET {self.FLAGS[self.channel]} = FALSE,
+                        updated_at = %s
+                    WHERE id = ANY(%s)
+                    """, (now, document_ids))
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        cur.execute(DEFER_NEXT_REMINDER_SQL, (tomorrow, document_ids))
+
+    def _absorb_pending_digest(self, cur, retry_at):
+        # While this digest was processing, later reminders for the same user,
+        # channel and day opened a new pending row under the same key. Only one
+        # pending row per key is allowed, so that row is folded into this one
+        # before it goes back to pending.
+        cur.execute("""
+                    SELECT id, payload -> 'documents', available_at
+                    FROM evoicebot_app_reminderoutbox
+                    WHERE digest_key = %s
+                      AND status = %s
+                      AND id <> %s
+                        FOR UPDATE
+                    """, (self.digest_key, self.PENDING, self.id))
+        rows = cur.fetchall()
+        if not rows:
+            return retry_at
+        absorbed_ids = [row_id for row_id, _, _ in rows]
+        cur.execute("""
+                    UPDATE evoicebot_app_reminderoutboxattempt
+                    SET outbox_id = %s
+                    WHERE outbox_id = ANY(%s)
+                    """, (self.id, absorbed_ids))
+        cur.execute("DELETE FROM evoicebot_app_reminderoutbox WHERE id = ANY(%s)", (absorbed_ids,))
+        self.payload = dict(self.payload, documents=self.payload['documents'] + [
+            document for _, documents, _ in rows for document in documents
+        ])
+        cur.execute("""
+                    UPDATE evoicebot_app_reminderoutbox
+                    SET payload = %s
+                    WHERE id = %s
+                    """, (Json(self.payload), self.id))
+        return min([retry_at] + [available_at for _, _, available_at in rows])
+
+
 User = UserProfile
@@ -0,0 +1,187 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from bot.config import (DB_POOL_MAX_SIZE, DB_STREAM_FETCH_SIZE, REMINDER_CLAIM_BATCH_SIZE,
+                        REMINDER_LEASE_SECONDS)
+from webapp.models import UserProfile, Document, VoiceCall, ReminderOutbox, ReminderLedger
+
+# Zapytania psycopg2 są blokujące, dlatego wykonujemy je w osobnych wątkach.
+# Liczba wątków odpowiada maksymalnemu rozmiarowi puli połączeń.
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+async def stream_db(chunks):
+    # Kolejna porcja jest pobierana w tle, podczas gdy wywołujący przetwarza bieżącą.
+    pending = asyncio.ensure_future(run_db(next, chunks, None))
+    try:
+        while True:
+            chunk = await pending
+            if chunk is None:
+                return
+            pending = asyncio.ensure_future(run_db(next, chunks, None))
+            yield chunk
+    finally:
+        if not pending.done():
+            await asyncio.wait([pending])
+        await run_db(chunks.close)
+
+
+class UserProfileRepository:
+    @staticmethod
+    async def get_by_telegram_id(telegram_id: int):
+        return await run_db(UserProfile.get_by_telegram_id, telegram_id)
+
+    @staticmethod
+    async def get_by_username(username: str):
+        return await run_db(UserProfile.get_by_username, username)
+
+    @staticmethod
+    async def get_by_id(profile_id: int):
+        return await run_db(UserProfile.get_by_id, profile_id)
+
+    @staticmethod
+    async def create(telegram_id: int, first_name: str, last_name: str = None,
+                     username: str = None, phone: str = None):
+        return await run_db(UserProfile.create, telegram_id, first_name, last_name=last_name,
+                            username=username, phone=phone)
+
+    @staticmethod
+    async def update_telegram_id(profile: UserProfile, telegram_id: int):
+        return await run_db(profile.update_telegram_id, telegram_id)
+
+    @staticmethod
+    async def update_phone(profile: UserProfile, phone: str):
+        return await run_db(profile.update_phone, phone)
+
+
+class DocumentRepository:
+    @staticmethod
+    async def create(user_id: int, file_id: str, title: str, mime_type: str = None, size: int = None):
+        return await run_db(Document.create, user_id, file_id, title, mime_type=mime_type, size=size)
+
+    @staticmethod
+    async def get_by_id(doc_id: int):
+        return await run_db(Document.get_by_id, doc_id)
+
+    @staticmethod
+    async def get_by_user_id(user_id: int, columns=Document.COLUMNS):
+        return await run_db(Document.get_by_user_id, user_id, columns)
+
+    @staticmethod
+    async def get_expiring_documents():
+        return await run_db(Document.get_expiring_documents)
+
+    @staticmethod
+    async def claim_due_documents(worker_id: str, as_of=None, limit: int = REMINDER_CLAIM_BATCH_SIZE,
+                                  lease_seconds: int = REMINDER_LEASE_SECONDS, columns=Document.REMINDER_COLUMNS):
+        return await run_db(Document.claim_due_documents, worker_id, as_of, limit, lease_seconds, columns)
+
+    @staticmethod
+    async def release_leases(document_ids, worker_id: str):
+        return await run_db(Document.release_leases, document_ids, worker_id)
+
+    @staticmethod
+    async def defer_next_reminders(document_ids, not_before):
+        return await run_db(Document.defer_next_reminders, document_ids, not_before)
+
+    @staticmethod
+    async def refresh_changed_documents():
+        return await run_db(Document.refresh_changed_documents)
+
+    @staticmethod
+    async def get_next_reminders(document_ids):
+        return await run_db(Document.get_next_reminders, document_ids)
+
+    @staticmethod
+    async def notify_reminder_changed(document_ids):
+        return await run_db(Document.notify_reminder_changed, document_ids)
+
+    @staticmethod
+    def stream_next_reminders(until, after=None, fetch_size: int = DB_STREAM_FETCH_SIZE):
+        return stream_db(Document.iter_next_reminders(until, after, fetch_size))
+
+    @staticmethod
+    def stream_by_user_id(user_id: int, fetch_size: int = DB_STREAM_FETCH_SIZE, columns=Document.COLUMNS):
+        return stream_db(Document.iter_by_user_id(user_id, fetch_size, columns))
+
+    @staticmethod
+    async def update_expiration_date(document: Document, expiration_date):
+        return await run_db(document.update_expiration_date, expiration_date)
+
+    @staticmethod
+    async def update_telegram_reminder_sent(document: Document, sent: bool = True):
+        return await run_db(document.update_telegram_reminder_sent, sent)
+
+    @staticmethod
+    async def update_sms_reminder_sent(document: Document, sent: bool = True):
+        return await run_db(document.update_sms_reminder_sent, sent)
+
+    @staticmethod
+    async def update_call_reminder_sent(document: Document, sent: bool = True):
+        return await run_db(document.update_call_reminder_sent, sent)
+
+    @staticmethod
+    async def increment_call_attempts(document: Document):
+        return await run_db(document.increment_call_attempts)
+
+    @staticmethod
+    async def update_call_message_listened(document: Document, listened: bool = True):
+        return await run_db(document.update_call_message_listened, listened)
+
+    @staticmethod
+    async def update_gcs_path(document: Document, gcs_path: str):
+        return await run_db(document.update_gcs_path, gcs_path)
+
+
+class VoiceCallRepository:
+    @staticmethod
+    async def create(sid: str, to_number: str, from_number: str, message_text: str,
+                     document_id: int = None, user_profile_id: int = None):
+        return await run_db(VoiceCall.create, sid, to_number, from_number, message_text,
+                            document_id=document_id, user_profile_id=user_profile_id)
+
+    @staticmethod
+    async def get_by_id(call_id: int):
+        return await run_db(VoiceCall.get_by_id, call_id)
+
+    @staticmethod
+    async def update_status(call: VoiceCall, status: str):
+        return await run_db(call.update_status, status)
+
+
+class ReminderLedgerRepository:
+    @staticmethod
+    async def get_by_id(ledger_id: int):
+        return await run_db(ReminderLedger.get_by_id, ledger_id)
+
+    @staticmethod
+    async def save_message(entry: ReminderLedger, message: str):
+        return await run_db(entry.save_message, message)
+
+    @staticmethod
+    async def mark_sent(entry: ReminderLedger, provider_ref: str = None):
+        return await run_db(entry.mark_sent, provider_ref)
+
+
+class ReminderOutboxRepository:
+    @staticmethod
+    async def enqueue(entries, digest: bool = False):
+        return await run_db(ReminderOutbox.enqueue, entries, digest)
+
+    @staticmethod
+    async def claim(worker_id: str, limit: int, lease_seconds: int = REMINDER_LEASE_SECONDS):
+        return await run_db(ReminderOutbox.claim, worker_id, limit, lease_seconds)
+
+    @staticmethod
+    async def mark_sent(entry: ReminderOutbox, started_at, duration_ms: int):
+        return await run_db(entry.mark_sent, started_at, duration_ms)
+
+    @staticmethod
+    async def mark_failed(entry: ReminderOutbox, error: str, started_at, duration_ms: int, retry_at=None):
+        return await run_db(entry.mark_failed, error, started_at, duration_ms, retry_at)
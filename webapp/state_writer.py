@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from bot.config import REMINDER_FLUSH_BATCH_SIZE, REMINDER_FLUSH_INTERVAL
+from webapp.models import Document
+from webapp.repository import run_db
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderStateWriter:
+    """
+    Zbiera zmiany flag przypomnień i zapisuje je zbiorczo jednym zapytaniem UPDATE ... FROM (VALUES ...).
+
+    mark() zwraca obiekt Future, który kończy się dopiero po zatwierdzeniu zmiany w bazie,
+    więc wywołujący, który na niego czeka, ma gwarancję trwałości zapisu. Zmiany zgłoszone
+    w tym samym oknie czasowym (flush_interval) lub do osiągnięcia batch_size trafiają do
+    jednej transakcji.
+    """
+
+    FIELDS = ('telegram_reminder_sent', 'sms_reminder_sent', 'call_reminder_sent', 'call_message_listened',
+              'call_attempts_delta', 'last_call_date')
+
+    def __init__(self, batch_size=REMINDER_FLUSH_BATCH_SIZE, flush_interval=REMINDER_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._waiters = []
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+
+    def mark(self, document_id, **changes):
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Nieznane pola stanu przypomnienia: {sorted(unknown)}")
+
+        entry = self._pending.setdefault(document_id, {})
+        for field, value in changes.items():
+            if field == 'call_attempts_delta':
+                entry[field] = entry.get(field, 0) + value
+            else:
+                entry[field] = value
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+
+        if len(self._pending) >= self.batch_size:
+            self._schedule(loop, 0)
+        elif self._timer is None:
+            self._schedule(loop, self.flush_interval)
+        return waiter
+
+    def _schedule(self, loop, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._pending:
+                return 0
+
+            pending, waiters = self._pending, self._waiters
+            self._pending, self._waiters = {}, []
+
+            now = datetime.now()
+            rows = [
+                (document_id,
+                 entry.get('telegram_reminder_sent'),
+                 entry.get('sms_reminder_sent'),
+                 entry.get('call_reminder_sent'),
+                 entry.get('call_message_listened'),
+                 entry.get('call_attempts_delta', 0),
+                 entry.get('last_call_date'),
+                 now)
+                for document_id, entry in pending.items()
+            ]
+
+            try:
+                await run_db(Document.bulk_update_reminder_state, rows)
+            except Exception as e:
+                logger.error(f"Błąd podczas zbiorczego zapisu stanu przypomnień ({len(rows)} dokumentów): {e}")
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                return 0
+
+            self.flushes += 1
+            self.rows_written += len(rows)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(len(rows))
+            return len(rows)
+
+    async def close(self):
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }